@@ -0,0 +1,282 @@
+"""Anonymised pages of Dodo IS for parsers' benchmarks.
+
+Pages reproduce markup of real Dodo IS reports, but names, phones and
+order numbers are fake and generated deterministically, so every run
+parses the same bytes.
+"""
+import datetime
+import io
+import pathlib
+import random
+from typing import Callable, Iterable, NamedTuple, Union
+
+import openpyxl
+
+__all__ = (
+    'SIZES',
+    'Fixture',
+    'FIXTURES',
+    'FIXTURES_DIR',
+    'load_fixture',
+    'record_fixtures',
+)
+
+FIXTURES_DIR = pathlib.Path(__file__).parent / 'fixtures'
+
+# Amount of rows (or filler blocks for pages without tables) of fixture of each size.
+SIZES = {
+    'small': 10,
+    'medium': 200,
+    'large': 2000,
+}
+
+DEPARTMENTS = [f'Москва {i}' for i in range(1, 41)]
+EMPLOYEES = [f'Сотрудник {i}' for i in range(1, 101)]
+
+
+def _get_random(name: str, size: str) -> random.Random:
+    return random.Random(f'{name}:{size}')
+
+
+def _format_dt(rnd: random.Random, with_seconds: bool = False) -> str:
+    dt = datetime.datetime(2022, 1, 1) + datetime.timedelta(seconds=rnd.randrange(30 * 24 * 60 * 60))
+    return dt.strftime('%d.%m.%Y %H:%M:%S' if with_seconds else '%d.%m.%Y %H:%M')
+
+
+def _wrap_page(body: str, filler_blocks: int = 0) -> str:
+    # Real pages contain menus, scripts and modals around the report.
+    filler = ''.join(
+        f'<div class="modal" id="modal-{i}"><ul class="nav">'
+        f'<li><a href="/Reports/{i}">Отчёт {i}</a></li><li><span>Раздел {i}</span></li>'
+        f'</ul><script>var settings{i} = {{"id": {i}}};</script></div>'
+        for i in range(filler_blocks)
+    )
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Dodo IS</title></head>'
+            f'<body><header><nav>{filler}</nav></header><main>{body}</main></body></html>')
+
+
+def _table(rows: list[list[str]], header: list[str], table_id: str = '',
+           indented: bool = True) -> str:
+    id_attribute = f' id="{table_id}"' if table_id else ''
+    cell_format = '<td>\n\t\t{}\n\t</td>' if indented else '<td>{}</td>'
+    head = ''.join(f'<th>{cell}</th>' for cell in header)
+    body = ''.join('<tr>' + ''.join(cell_format.format(cell) for cell in row) + '</tr>'
+                   for row in rows)
+    return f'<table class="table"{id_attribute}><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
+
+
+def make_kitchen_statistics(size: str) -> str:
+    rnd = _get_random('kitchen_statistics', size)
+    panels = [
+        f'{rnd.randrange(10000, 99999):,} ₽\n<span>{rnd.randrange(-50, 50)} %</span>'.replace(',', ' '),
+        f'{rnd.randrange(1000, 9999)},{rnd.randrange(10)}\n<span>{rnd.randrange(-50, 50)} %</span>',
+        f'{rnd.randrange(100)} %',
+        f'{rnd.randrange(5, 30):02}:{rnd.randrange(60):02}',
+    ]
+    body = ''.join(f'<div class="panel"><h1 class="operationalStatistics_panelTitle">{panel}</h1></div>'
+                   for panel in panels)
+    body += ''.join(f'<h1 class="operationalStatistics_productsCountValue">{rnd.randrange(30)}</h1>'
+                    for _ in range(3))
+    return _wrap_page(body, SIZES[size])
+
+
+def make_delivery_statistics(size: str) -> str:
+    rnd = _get_random('delivery_statistics', size)
+    panels = [
+        f'{rnd.randrange(1, 9)},{rnd.randrange(10)}\n<span>{rnd.randrange(-50, 50)} %</span>',
+        f'{rnd.randrange(100)} %',
+        f'{rnd.randrange(30)}',
+        f'{rnd.randrange(10, 30)} / {rnd.randrange(10)}',
+        f'{rnd.randrange(100)} %',
+        f'{rnd.randrange(30):02}:{rnd.randrange(60):02}',
+    ]
+    body = ''.join(f'<div class="panel"><h1 class="operationalStatistics_panelTitle">{panel}</h1></div>'
+                   for panel in panels)
+    return _wrap_page(body, SIZES[size])
+
+
+def make_being_late_certificates(size: str) -> str:
+    rnd = _get_random('being_late_certificates', size)
+    rows = [[
+        rnd.choice(DEPARTMENTS),
+        _format_dt(rnd, with_seconds=True),
+        f'{rnd.randrange(1, 999)}-{rnd.randrange(1, 9)}',
+        f'{rnd.randrange(20, 90)} мин.',
+        _format_dt(rnd),
+        _format_dt(rnd),
+        'Опоздание',
+        rnd.choice(EMPLOYEES),
+    ] for _ in range(SIZES[size])]
+    filter_table = '<table><tr><td>Период</td><td>01.01.2022 - 31.01.2022</td></tr></table>'
+    header = ['Пиццерия', 'Дата', 'Номер', 'Время', 'Отметка', 'Дедлайн', 'Тип', 'Выдал']
+    return _wrap_page(filter_table + _table(rows, header))
+
+
+def make_canceled_orders(size: str) -> str:
+    rnd = _get_random('canceled_orders', size)
+    rows = [[
+        f'<a href="/Managment/ShiftManagment/Order?orderUuid={rnd.getrandbits(128):032x}">Заказ</a>',
+        f'{rnd.randrange(1, 999)}-{rnd.randrange(1, 9)}',
+        _format_dt(rnd),
+        rnd.choice(DEPARTMENTS),
+        f'{rnd.randrange(300, 5000)} ₽',
+        'Отменён',
+        rnd.choice(EMPLOYEES),
+        rnd.choice(['Доставка', 'Самовывоз', 'Ресторан']),
+    ] for _ in range(SIZES[size])]
+    header = ['', 'Номер', 'Дата', 'Пиццерия', 'Сумма', 'Статус', 'Сотрудник', 'Тип']
+    return _wrap_page(_table(rows, header, indented=False))
+
+
+def make_canceled_order(size: str) -> str:
+    rnd = _get_random('canceled_order', size)
+    events = max(SIZES[size], 3)
+    messages = (['Order has been accepted']
+                + ['Order status has been changed'] * (events - 3)
+                + ['Refund receipt has been printed', 'Order has been rejected'])
+    rows = [[_format_dt(rnd, with_seconds=True), message, rnd.choice(EMPLOYEES)]
+            for message in messages]
+    body = (f'<span id="orderNumber">{rnd.randrange(1, 999)}-{rnd.randrange(1, 9)}</span>'
+            f'<div class="headerDepartment">{rnd.choice(DEPARTMENTS)}</div>'
+            f'<div id="history">{_table(rows, ["Дата", "Событие", "Сотрудник"], indented=False)}</div>')
+    return _wrap_page(body)
+
+
+def make_departments_list(size: str) -> str:
+    options = ''.join(f'<option value="{i}">\n{DEPARTMENTS[i % len(DEPARTMENTS)]}-{i}\n</option>'
+                      for i in range(1, SIZES[size] + 1))
+    return _wrap_page(f'<form><select id="unitId" multiple>{options}</select></form>')
+
+
+def make_pizzeria_stop_sales(size: str) -> str:
+    rnd = _get_random('pizzeria_stop_sales', size)
+    rows = [[
+        rnd.choice(DEPARTMENTS), 'Доставка', 'Нет курьеров', _format_dt(rnd),
+        rnd.choice(EMPLOYEES), f'{rnd.randrange(60)} мин.', rnd.choice(EMPLOYEES + ['']),
+        'Полная',
+    ] for _ in range(SIZES[size])]
+    header = ['Пиццерия', 'Продажи', 'Причина', 'Начало', 'Кто', 'Длительность', 'Кто', 'Тип']
+    return _wrap_page(_table(rows, header, 'bootgrid-table'))
+
+
+def make_sector_stop_sales(size: str) -> str:
+    rnd = _get_random('sector_stop_sales', size)
+    rows = [[
+        rnd.choice(DEPARTMENTS), f'Сектор {rnd.randrange(20)}', _format_dt(rnd),
+        rnd.choice(EMPLOYEES), f'{rnd.randrange(60)} мин.', rnd.choice(EMPLOYEES + ['']),
+    ] for _ in range(SIZES[size])]
+    header = ['Пиццерия', 'Сектор', 'Начало', 'Кто', 'Длительность', 'Кто']
+    return _wrap_page(_table(rows, header, 'bootgrid-table'))
+
+
+def make_street_stop_sales(size: str) -> str:
+    rnd = _get_random('street_stop_sales', size)
+    rows = [[
+        rnd.choice(DEPARTMENTS), f'Сектор {rnd.randrange(20)}', f'Улица {rnd.randrange(500)}',
+        _format_dt(rnd), rnd.choice(EMPLOYEES), f'{rnd.randrange(60)} мин.',
+        rnd.choice(EMPLOYEES + ['']),
+    ] for _ in range(SIZES[size])]
+    header = ['Пиццерия', 'Сектор', 'Улица', 'Начало', 'Кто', 'Длительность', 'Кто']
+    return _wrap_page(_table(rows, header, 'bootgrid-table'))
+
+
+def make_ingredient_stop_sales(size: str) -> str:
+    rnd = _get_random('ingredient_stop_sales', size)
+    rows = [[
+        rnd.choice(DEPARTMENTS), f'Ингредиент {rnd.randrange(100)}', 'Закончился',
+        _format_dt(rnd), rnd.choice(EMPLOYEES), f'{rnd.randrange(60)} мин.',
+        rnd.choice(EMPLOYEES + ['']),
+    ] for _ in range(SIZES[size])]
+    header = ['Пиццерия', 'Ингредиент', 'Причина', 'Начало', 'Кто', 'Длительность', 'Кто']
+    return _wrap_page(_table(rows, header))
+
+
+def make_restaurant_orders(size: str) -> str:
+    rnd = _get_random('restaurant_orders', size)
+    rows = [[
+        rnd.choice(DEPARTMENTS), _format_dt(rnd), f'{rnd.randrange(1, 999)}-{rnd.randrange(1, 9)}',
+        'Ресторан', f'Клиент {rnd.randrange(1000)}', f'+7900{rnd.randrange(10 ** 7):07}',
+        str(rnd.randrange(300, 5000)), 'Наличные', 'Выполнен', rnd.choice(EMPLOYEES),
+    ] for _ in range(SIZES[size])]
+    header = ['Пиццерия', 'Дата', 'Номер', 'Тип', 'Клиент', 'Телефон', 'Сумма', 'Оплата',
+              'Статус', 'Принял']
+    return _wrap_page(_table(rows, header))
+
+
+def make_detailed_delivery_statistics(size: str) -> bytes:
+    rnd = _get_random('detailed_delivery_statistics', size)
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.append(['Статистика доставки'])
+    for _ in range(5):
+        worksheet.append([])
+    for i in range(SIZES[size]):
+        times = [datetime.time(0, rnd.randrange(60), rnd.randrange(60)) for _ in range(4)]
+        worksheet.append([DEPARTMENTS[i % len(DEPARTMENTS)], rnd.randrange(1000),
+                          rnd.randrange(100), *times])
+    file = io.BytesIO()
+    workbook.save(file)
+    return file.getvalue()
+
+
+class Fixture(NamedTuple):
+    name: str
+    extension: str
+    make: Callable[[str], Union[str, bytes]]
+
+    def get_path(self, size: str, directory: pathlib.Path = FIXTURES_DIR) -> pathlib.Path:
+        return directory / f'{self.name}.{size}.{self.extension}'
+
+
+FIXTURES = {fixture.name: fixture for fixture in (
+    Fixture('kitchen_statistics', 'html', make_kitchen_statistics),
+    Fixture('delivery_statistics', 'html', make_delivery_statistics),
+    Fixture('being_late_certificates', 'html', make_being_late_certificates),
+    Fixture('canceled_orders', 'html', make_canceled_orders),
+    Fixture('canceled_order', 'html', make_canceled_order),
+    Fixture('departments_list', 'html', make_departments_list),
+    Fixture('pizzeria_stop_sales', 'html', make_pizzeria_stop_sales),
+    Fixture('sector_stop_sales', 'html', make_sector_stop_sales),
+    Fixture('street_stop_sales', 'html', make_street_stop_sales),
+    Fixture('ingredient_stop_sales', 'html', make_ingredient_stop_sales),
+    Fixture('restaurant_orders', 'html', make_restaurant_orders),
+    Fixture('detailed_delivery_statistics', 'xlsx', make_detailed_delivery_statistics),
+)}
+
+
+def load_fixture(name: str, size: str, directory: pathlib.Path = FIXTURES_DIR) -> bytes:
+    """Load raw bytes of recorded fixture, or generate it if it isn't recorded."""
+    path = FIXTURES[name].get_path(size, directory)
+    if path.exists():
+        return path.read_bytes()
+    content = FIXTURES[name].make(size)
+    return content if isinstance(content, bytes) else content.encode()
+
+
+def record_fixtures(directory: pathlib.Path = FIXTURES_DIR, sizes: Iterable[str] = tuple(SIZES),
+                    overwrite: bool = False) -> list[pathlib.Path]:
+    """Write fixtures of given sizes to directory.
+
+    Args:
+        directory: Directory of fixtures.
+        sizes: Sizes of fixtures to write.
+        overwrite: Regenerate fixtures that are already in directory.
+            Otherwise they are kept as is.
+
+    Returns:
+        Paths of written fixtures.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    written_paths = []
+    for fixture in FIXTURES.values():
+        for size in sizes:
+            path = fixture.get_path(size, directory)
+            if path.exists() and not overwrite:
+                continue
+            content = fixture.make(size)
+            if isinstance(content, bytes):
+                path.write_bytes(content)
+            else:
+                path.write_text(content, encoding='utf-8')
+            written_paths.append(path)
+    return written_paths
@@ -0,0 +1,163 @@
+"""Benchmarks of Dodo IS parsers.
+
+Every parser is run on fixtures of every size with every backend it supports.
+Time is the best of several runs, memory is peak of Python allocations
+during one run (memory of libxml2 isn't traced).
+
+Usage:
+    python benchmarks/run_parser_benchmarks.py
+    python benchmarks/run_parser_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_parser_benchmarks.py --baseline benchmarks/baseline.json
+    python benchmarks/run_parser_benchmarks.py --record --sizes small medium
+
+Recording writes only missing fixtures of given sizes, pass --overwrite
+to regenerate the existing ones.
+
+With baseline the script exits with code 1 if any benchmark got slower
+or bigger than baseline by more than tolerance.
+"""
+import argparse
+import json
+import pathlib
+import sys
+import time
+import tracemalloc
+from typing import Callable, NamedTuple, Optional
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / 'src'))
+
+from dodo_api.parsers import excel, html  # noqa: E402
+
+import fixtures  # noqa: E402
+
+
+class Benchmark(NamedTuple):
+    fixture_name: str
+    parse: Callable[[bytes, Optional[str]], object]
+    backends: tuple[Optional[str], ...] = (html.SOUP_BACKEND, html.LXML_BACKEND)
+
+
+class Result(NamedTuple):
+    time: float
+    memory: int
+
+
+def _parse_html(parser: type[html.HTMLParser]):
+    return lambda page, backend: parser(page, backend=backend).parse()
+
+
+def _parse_canceled_order(page: bytes, backend: Optional[str]):
+    return html.CanceledOrderByUUIDHTMLParser(page, 'uuid', '1000', 'Доставка',
+                                              backend=backend).parse()
+
+
+def _parse_detailed_delivery_statistics(content: bytes, backend: Optional[str]):
+    with excel.DeliveryStatisticsExcelParser(content) as parser:
+        return parser.get_data()
+
+
+BENCHMARKS = {benchmark.fixture_name: benchmark for benchmark in (
+    Benchmark('kitchen_statistics', _parse_html(html.KitchenStatisticsHTMLParser)),
+    Benchmark('delivery_statistics', _parse_html(html.DeliveryStatisticsHTMLParser)),
+    Benchmark('being_late_certificates', _parse_html(html.BeingLateCertificatesTableParser)),
+    Benchmark('canceled_orders', _parse_html(html.CanceledOrderUUIDsParser)),
+    Benchmark('canceled_order', _parse_canceled_order),
+    Benchmark('departments_list', _parse_html(html.DepartmentsListHTMLParser)),
+    Benchmark('pizzeria_stop_sales', _parse_html(html.PizzeriaStopSalesHTMLParser)),
+    Benchmark('sector_stop_sales', _parse_html(html.SectorStopSalesHTMLParser)),
+    Benchmark('street_stop_sales', _parse_html(html.StreetStopSalesHTMLParser)),
+    Benchmark('ingredient_stop_sales', _parse_html(html.IngredientStopSalesHTMLParser)),
+    Benchmark('restaurant_orders', _parse_html(html.RestaurantOrdersParser)),
+    Benchmark('detailed_delivery_statistics', _parse_detailed_delivery_statistics, (None,)),
+)}
+
+
+def measure(parse: Callable[[], object], repeat: int) -> Result:
+    parse()
+    best_time = float('inf')
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        parse()
+        best_time = min(best_time, time.perf_counter() - started_at)
+    tracemalloc.start()
+    try:
+        parse()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return Result(time=best_time, memory=peak_memory)
+
+
+def run_benchmarks(names: list[str], sizes: list[str], repeat: int) -> dict[str, Result]:
+    results = {}
+    for name in names:
+        benchmark = BENCHMARKS[name]
+        for size in sizes:
+            page = fixtures.load_fixture(name, size)
+            for backend in benchmark.backends:
+                key = '/'.join((name, size, backend or 'openpyxl'))
+                results[key] = measure(lambda: benchmark.parse(page, backend), repeat)
+                print(f'{key:<50} {results[key].time * 1000:>10.2f} ms'
+                      f' {results[key].memory / 1024:>10.1f} KiB')
+    return results
+
+
+def compare(results: dict[str, Result], baseline: dict[str, Result], tolerance: float) -> list[str]:
+    """Get descriptions of benchmarks that are worse than baseline by more than tolerance."""
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for field in Result._fields:
+            value, baseline_value = getattr(result, field), getattr(baseline[key], field)
+            if baseline_value and value > baseline_value * (1 + tolerance):
+                regressions.append(f'{key}: {field} {baseline_value:.6g} -> {value:.6g}'
+                                   f' (+{(value / baseline_value - 1) * 100:.0f}%)')
+    return regressions
+
+
+def load_baseline(path: pathlib.Path) -> dict[str, Result]:
+    return {key: Result(**value) for key, value in json.loads(path.read_text()).items()}
+
+
+def save_baseline(path: pathlib.Path, results: dict[str, Result]):
+    path.write_text(json.dumps({key: result._asdict() for key, result in results.items()},
+                               indent=2, sort_keys=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of Dodo IS parsers.')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f'Benchmarks to run, all by default: {", ".join(BENCHMARKS)}.')
+    parser.add_argument('--sizes', nargs='+', choices=list(fixtures.SIZES),
+                        default=list(fixtures.SIZES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', type=pathlib.Path, help='Compare results with baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative regression, 0.2 by default.')
+    parser.add_argument('--save-baseline', type=pathlib.Path, help='Save results as baseline.')
+    parser.add_argument('--record', action='store_true',
+                        help='Write missing fixtures of given sizes to benchmarks/fixtures and exit.')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='Regenerate existing fixtures too when recording.')
+    args = parser.parse_args()
+
+    if args.record:
+        for path in fixtures.record_fixtures(sizes=args.sizes, overwrite=args.overwrite):
+            print(f'recorded {path}')
+        return
+    unknown_names = set(args.names) - set(BENCHMARKS)
+    if unknown_names:
+        parser.error(f'unknown benchmarks: {", ".join(sorted(unknown_names))}')
+    results = run_benchmarks(args.names or list(BENCHMARKS), args.sizes, args.repeat)
+    if args.save_baseline is not None:
+        save_baseline(args.save_baseline, results)
+    if args.baseline is not None:
+        regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+        if regressions:
+            print('\nRegressions:', *regressions, sep='\n')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,13 @@ __all__ = (
     'TELEGRAM_NOTIFICATION_ATTEMPTS',
     'REPORT_NOTIFICATIONS_QUEUE',
     'PIZZERIA_SECTOR_STREET_STOP_SALES_DELAY',
+    'PARSING_PROCESSES',
+    'DODO_API_RECORD_PATH',
+    'DODO_API_REPLAY_PATH',
+    'DODO_API_REPLAY_LATENCY_FACTOR',
+    'DODO_API_REPLAY_ERROR_RATE',
+    'NOTIFICATION_DIGEST_WINDOW',
+    'NOTIFICATION_MAX_DELIVERIES',
 )
 
 env = Env()
@@ -32,3 +39,14 @@ STOP_SALE_URGENCY_THRESHOLD = env.int('STOP_SALE_URGENCY_THRESHOLD')
 ALLOWED_STOP_SALES_THRESHOLD = env.int('ALLOWED_STOP_SALES_THRESHOLD')
 TELEGRAM_NOTIFICATION_ATTEMPTS = env.int('TELEGRAM_NOTIFICATION_ATTEMPTS')
 PIZZERIA_SECTOR_STREET_STOP_SALES_DELAY = env.int('PIZZERIA_SECTOR_STREET_STOP_SALES_DELAY')
+# Amount of processes that parse pages in loader, 0 means parsing in threads.
+PARSING_PROCESSES = env.int('PARSING_PROCESSES', 0)
+# Directory to record responses of Dodo IS to, or to replay them from instead of real requests.
+DODO_API_RECORD_PATH = env.str('DODO_API_RECORD_PATH', '')
+DODO_API_REPLAY_PATH = env.str('DODO_API_REPLAY_PATH', '')
+DODO_API_REPLAY_LATENCY_FACTOR = env.float('DODO_API_REPLAY_LATENCY_FACTOR', 0)
+DODO_API_REPLAY_ERROR_RATE = env.float('DODO_API_REPLAY_ERROR_RATE', 0)
+# Seconds while notifications to chat are collected into one message, 0 sends them one by one.
+NOTIFICATION_DIGEST_WINDOW = env.float('NOTIFICATION_DIGEST_WINDOW', 15)
+# Times notification is delivered to notifiers before it's moved to dead letters.
+NOTIFICATION_MAX_DELIVERIES = env.int('NOTIFICATION_MAX_DELIVERIES', 5)
@@ -1,18 +1,65 @@
 import json
-from typing import Iterable
+from typing import Iterable, Mapping, Optional
 
-from redis import Redis
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import ResponseError
 
 from db.exceptions import CachedObjectExpiredOrMissing, CookiesDoNotExist
 
-_redis = Redis(host='localhost', port=6379, db=0, decode_responses=True)
+# Connections are shared by all coroutines of process, pool only limits their amount.
+MAX_CONNECTIONS = 32
 
+_pool = ConnectionPool(host='localhost', port=6379, db=0, decode_responses=True,
+                       max_connections=MAX_CONNECTIONS)
+_raw_pool = ConnectionPool(host='localhost', port=6379, db=0, max_connections=MAX_CONNECTIONS)
+_redis = Redis(connection_pool=_pool)
+_raw_redis = Redis(connection_pool=_raw_pool)
+# redis-py 4.2 drops cursor of XAUTOCLAIM, so its response is parsed here.
+_redis.set_response_callback('XAUTOCLAIM', lambda response, **options: response)
 
-def get_cookies_lifetime(account_name_alias: str) -> int:
-    return _redis.ttl(account_name_alias)
+# Seconds while cached objects are valid.
+CACHE_LIFETIME = 60
+# Seconds while UUIDs of canceled orders of business day are kept.
+CANCELED_ORDERS_UUIDS_LIFETIME = 3 * 24 * 60 * 60
+# Set of UUIDs of all days that was used before they were partitioned by business day.
+LEGACY_CANCELED_ORDERS_UUIDS_KEY = 'canceled-orders-uuids'
 
+# Seconds while state of stop sales is kept after the last poll.
+STOP_SALES_STATE_LIFETIME = 2 * 24 * 60 * 60
 
-def get_cookies(account_name: str) -> dict:
+REPORT_NOTIFICATIONS_STREAM = 'report-notifications-stream'
+REPORT_NOTIFICATIONS_GROUP = 'report-notifiers'
+# Approximate max length of stream, the oldest entries are trimmed.
+REPORT_NOTIFICATIONS_MAX_LENGTH = 10000
+# Seconds while chats that got notification are kept, longer than all its deliveries.
+REPORT_NOTIFICATION_CHATS_LIFETIME = 24 * 60 * 60
+# Notifications that failed too many times, kept for investigation.
+REPORT_NOTIFICATIONS_DEAD_LETTERS_STREAM = 'report-notifications-dead-letters'
+
+# ID of pending notification that the next claim of stale ones starts from.
+_claim_cursor = '0-0'
+
+
+def get_client() -> Redis:
+    return _redis
+
+
+def get_raw_client() -> Redis:
+    """Get client that doesn't decode responses, e.g. for pickled values."""
+    return _raw_redis
+
+
+async def close():
+    """Close connections of all pools. Call it on shutdown of process."""
+    await _pool.disconnect()
+    await _raw_pool.disconnect()
+
+
+async def get_cookies_lifetime(account_name_alias: str) -> int:
+    return await _redis.ttl(account_name_alias)
+
+
+async def get_cookies(account_name: str) -> dict:
     """Get cookies from redis.
 
     Args:
@@ -24,45 +71,277 @@ def get_cookies(account_name: str) -> dict:
     Raises:
         CookiesDoNotExist error if cookies not found in redis.
     """
-    cookies = _redis.hgetall(account_name)
+    cookies = await _redis.hgetall(account_name)
     if not cookies:
         raise CookiesDoNotExist
     return cookies
 
 
-def get_canceled_orders_uuids() -> set[str]:
-    return _redis.smembers('canceled-orders-uuids')
+def get_canceled_orders_uuids_key(date: str) -> str:
+    return f'canceled-orders-uuids:{date}'
+
+
+async def get_canceled_orders_uuids(date: str) -> set[str]:
+    return await _redis.smembers(get_canceled_orders_uuids_key(date))
+
+
+async def is_canceled_order_uuid_in_db(date: str, uuid: str) -> bool:
+    return await _redis.sismember(get_canceled_orders_uuids_key(date), uuid)
+
+
+async def get_new_canceled_order_uuids(date: str, uuids: Iterable[str]) -> list[str]:
+    """Get UUIDs that aren't stored yet in one round trip.
+
+    Args:
+        date: Business day of canceled orders.
+        uuids: UUIDs of canceled orders.
+
+    Returns:
+        UUIDs that aren't stored, in the same order.
+    """
+    uuids = list(uuids)
+    if not uuids:
+        return []
+    key = get_canceled_orders_uuids_key(date)
+    async with _redis.pipeline(transaction=False) as pipeline:
+        for uuid in uuids:
+            pipeline.sismember(key, uuid)
+        are_stored = await pipeline.execute()
+    return [uuid for uuid, is_stored in zip(uuids, are_stored) if not is_stored]
+
+
+async def add_canceled_order_uuid(date: str, uuid: str) -> int:
+    """Store UUID of canceled order.
+    UUIDs of business day expire together CANCELED_ORDERS_UUIDS_LIFETIME after the last one is stored.
+    """
+    key = get_canceled_orders_uuids_key(date)
+    async with _redis.pipeline() as pipeline:
+        pipeline.sadd(key, uuid)
+        pipeline.expire(key, CANCELED_ORDERS_UUIDS_LIFETIME)
+        is_added, _ = await pipeline.execute()
+    return is_added
+
+
+async def migrate_legacy_canceled_orders_uuids(date: str) -> bool:
+    """Move UUIDs of legacy set to set of business day, so they aren't reported again.
+
+    Returns:
+        True if legacy set existed and was moved.
+    """
+    key = get_canceled_orders_uuids_key(date)
+    async with _redis.pipeline() as pipeline:
+        pipeline.sunionstore(key, key, LEGACY_CANCELED_ORDERS_UUIDS_KEY)
+        pipeline.expire(key, CANCELED_ORDERS_UUIDS_LIFETIME)
+        pipeline.delete(LEGACY_CANCELED_ORDERS_UUIDS_KEY)
+        _, _, is_deleted = await pipeline.execute()
+    return bool(is_deleted)
+
+
+async def add_report_notification_to_queue(report_notification_as_json: str):
+    await _redis.xadd(REPORT_NOTIFICATIONS_STREAM, {'notification': report_notification_as_json},
+                      maxlen=REPORT_NOTIFICATIONS_MAX_LENGTH, approximate=True)
+
+
+async def create_report_notifications_group():
+    """Create group of notifiers' consumers if it doesn't exist.
+    New group receives all notifications that are in stream already.
+    """
+    try:
+        await _redis.xgroup_create(REPORT_NOTIFICATIONS_STREAM, REPORT_NOTIFICATIONS_GROUP,
+                                   id='0', mkstream=True)
+    except ResponseError as error:
+        if not str(error).startswith('BUSYGROUP'):
+            raise
+
+
+def _get_report_notifications(entries: list) -> list[tuple[str, str]]:
+    # Entries trimmed from stream while pending have no fields.
+    return [(entry_id, fields['notification']) for entry_id, fields in entries if fields]
+
+
+async def get_report_notifications_from_queue(
+        consumer_name: str, count: int = 10, block: Optional[int] = None,
+) -> list[tuple[str, str]]:
+    """Get new notifications for consumer of group.
+    Every notification stays pending until it's acknowledged.
+
+    Args:
+        consumer_name: Name of consumer, unique among running notifiers.
+        count: Max amount of notifications.
+        block: Milliseconds to wait for notifications if there are none, don't wait by default.
+
+    Returns:
+        Pairs of ID of entry and notification as JSON, in order of adding.
+    """
+    response = await _redis.xreadgroup(REPORT_NOTIFICATIONS_GROUP, consumer_name,
+                                       {REPORT_NOTIFICATIONS_STREAM: '>'}, count=count, block=block)
+    if not response:
+        return []
+    [(_, entries)] = response
+    return _get_report_notifications(entries)
+
+
+async def claim_stale_report_notifications(
+        consumer_name: str, min_idle_time: int, count: int = 10,
+) -> list[tuple[str, str]]:
+    """Take over notifications that are pending longer than min_idle_time,
+    e.g. because their consumer crashed before acknowledgement.
+
+    Pending notifications are scanned from where the previous call stopped,
+    and scan starts over after the end of pending list. Entries trimmed from
+    stream while pending are acknowledged, so they aren't claimed again.
+
+    Args:
+        consumer_name: Name of consumer that takes notifications over.
+        min_idle_time: Milliseconds since the last delivery of notification.
+        count: Max amount of notifications.
+
+    Returns:
+        Pairs of ID of entry and notification as JSON, in order of adding.
+    """
+    global _claim_cursor
+    report_notifications = []
+    while len(report_notifications) < count:
+        # Redis 7 also returns IDs of trimmed entries, they are removed from pending list already.
+        cursor, entries, *_ = await _redis.execute_command(
+            'XAUTOCLAIM', REPORT_NOTIFICATIONS_STREAM, REPORT_NOTIFICATIONS_GROUP, consumer_name,
+            min_idle_time, _claim_cursor, 'COUNT', count - len(report_notifications),
+        )
+        trimmed_entry_ids = [entry_id for entry_id, fields in entries if not fields]
+        if trimmed_entry_ids:
+            await acknowledge_report_notifications(*trimmed_entry_ids)
+        report_notifications += [(entry_id, dict(zip(fields[::2], fields[1::2]))['notification'])
+                                 for entry_id, fields in entries if fields]
+        _claim_cursor = cursor
+        if cursor == '0-0':
+            break
+    return report_notifications
+
+
+async def refresh_report_notifications(consumer_name: str, *entry_ids: str):
+    """Reset idle time of notifications pending at consumer, so they aren't taken over
+    while they're in progress. Delivery counts of notifications aren't changed.
+    """
+    if entry_ids:
+        await _redis.xclaim(REPORT_NOTIFICATIONS_STREAM, REPORT_NOTIFICATIONS_GROUP, consumer_name,
+                            0, list(entry_ids), justid=True)
+
+
+def get_report_notification_chats_key(entry_id: str) -> str:
+    return f'report-notification-chats:{entry_id}'
+
+
+async def get_report_notification_chat_ids(entry_id: str) -> set[int]:
+    """Get IDs of chats that got notification on its previous deliveries."""
+    return {int(chat_id) for chat_id in
+            await _redis.smembers(get_report_notification_chats_key(entry_id))}
+
+
+async def add_report_notification_chat_id(entry_id: str, chat_id: int):
+    key = get_report_notification_chats_key(entry_id)
+    async with _redis.pipeline() as pipeline:
+        pipeline.sadd(key, chat_id)
+        pipeline.expire(key, REPORT_NOTIFICATION_CHATS_LIFETIME)
+        await pipeline.execute()
+
 
+async def acknowledge_report_notifications(*entry_ids: str) -> int:
+    """Acknowledge notifications and forget chats that got them."""
+    async with _redis.pipeline() as pipeline:
+        pipeline.xack(REPORT_NOTIFICATIONS_STREAM, REPORT_NOTIFICATIONS_GROUP, *entry_ids)
+        pipeline.delete(*(get_report_notification_chats_key(entry_id) for entry_id in entry_ids))
+        acknowledged, _ = await pipeline.execute()
+    return acknowledged
 
-def is_canceled_order_uuid_in_db(uuid: str) -> bool:
-    return _redis.sismember('canceled-orders-uuids', uuid)
 
+async def get_report_notification_deliveries(entry_id: str) -> int:
+    """Get how many times pending notification is delivered to consumers, 0 if it isn't pending."""
+    pending = await _redis.xpending_range(REPORT_NOTIFICATIONS_STREAM, REPORT_NOTIFICATIONS_GROUP,
+                                          min=entry_id, max=entry_id, count=1)
+    return pending[0]['times_delivered'] if pending else 0
 
-def add_canceled_order_uuid(uuid: str) -> int:
-    return _redis.sadd('canceled-orders-uuids', uuid)
 
+async def move_report_notification_to_dead_letters(entry_id: str, report_notification_as_json: str,
+                                                   error: str):
+    """Acknowledge notification and add it with error to stream of dead letters atomically."""
+    async with _redis.pipeline() as pipeline:
+        pipeline.xadd(REPORT_NOTIFICATIONS_DEAD_LETTERS_STREAM,
+                      {'entry_id': entry_id, 'notification': report_notification_as_json,
+                       'error': error},
+                      maxlen=REPORT_NOTIFICATIONS_MAX_LENGTH, approximate=True)
+        pipeline.xack(REPORT_NOTIFICATIONS_STREAM, REPORT_NOTIFICATIONS_GROUP, entry_id)
+        pipeline.delete(get_report_notification_chats_key(entry_id))
+        await pipeline.execute()
 
-def add_report_notification_to_queue(report_notification_as_json: str):
-    _redis.sadd('report-notifications-queue', report_notification_as_json)
 
+def get_stop_sales_state_key(stop_sale_type: str) -> str:
+    return f'stop-sales-state:{stop_sale_type}'
 
-def get_report_notification_from_queue() -> str:
-    return _redis.spop('report-notifications-queue')
 
+async def get_stop_sales_state(stop_sale_type: str) -> dict[str, str]:
+    return await _redis.hgetall(get_stop_sales_state_key(stop_sale_type))
 
-def set_to_cache(name: str, json_string: str) -> bool:
-    is_set = _redis.set(name, json_string)
-    _redis.expire(name, 60)
-    return is_set
 
+async def set_stop_sales_state(stop_sale_type: str, state: Mapping[str, str]):
+    """Replace state of stop sales of type atomically.
 
-def get_from_cache(name: str) -> str:
-    cached = _redis.get(name)
+    Args:
+        stop_sale_type: Type of stop sales.
+        state: The last emitted events by keys of open stop sales.
+    """
+    key = get_stop_sales_state_key(stop_sale_type)
+    async with _redis.pipeline() as pipeline:
+        pipeline.delete(key)
+        if state:
+            pipeline.hset(key, mapping=state)
+            pipeline.expire(key, STOP_SALES_STATE_LIFETIME)
+        await pipeline.execute()
+
+
+async def set_to_cache(name: str, json_string: str) -> bool:
+    return await _redis.set(name, json_string, ex=CACHE_LIFETIME)
+
+
+async def set_many_to_cache(json_strings: Mapping[str, str]) -> dict[str, bool]:
+    """Store all objects in one round trip, every one with expiry set atomically.
+
+    Args:
+        json_strings: Serialized objects by names.
+
+    Returns:
+        Results of storing by names.
+    """
+    if not json_strings:
+        return {}
+    async with _redis.pipeline(transaction=False) as pipeline:
+        for name, json_string in json_strings.items():
+            pipeline.set(name, json_string, ex=CACHE_LIFETIME)
+        results = await pipeline.execute()
+    return dict(zip(json_strings, results))
+
+
+async def get_from_cache(name: str) -> str:
+    cached = await _redis.get(name)
     if cached is None:
         raise CachedObjectExpiredOrMissing
     return cached
 
 
-def add_detailed_delivery_statistics_request(chat_id: int, department_ids: Iterable[int]):
+async def get_many_from_cache(names: Iterable[str]) -> dict[str, Optional[str]]:
+    """Get objects in one round trip.
+
+    Args:
+        names: Names of objects.
+
+    Returns:
+        Serialized objects by names, None for expired or missing ones.
+    """
+    names = list(names)
+    if not names:
+        return {}
+    return dict(zip(names, await _redis.mget(names)))
+
+
+async def add_detailed_delivery_statistics_request(chat_id: int, department_ids: Iterable[int]):
     json_string = json.dumps({'chat_id': chat_id, 'department_ids': department_ids})
-    _redis.sadd('detailed-delivery-statistics-request', json_string)
+    await _redis.sadd('detailed-delivery-statistics-request', json_string)
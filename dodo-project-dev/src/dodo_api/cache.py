@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import json
+import math
+import pickle
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, NamedTuple, Optional
+
+from loguru import logger
+from pydantic import BaseModel, parse_obj_as
+from pydantic.json import pydantic_encoder
+from redis.exceptions import RedisError
+
+__all__ = (
+    'CacheEntry',
+    'ResultCache',
+    'MemoryResultCache',
+    'RedisResultCache',
+    'get_result_cache',
+    'set_result_cache',
+    'get_or_fetch',
+    'store',
+)
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    stored_at: float
+
+
+class ResultCache(ABC):
+
+    @abstractmethod
+    async def get(self, key: str, value_type: Any) -> Optional[CacheEntry]:
+        """Get value stored by key.
+
+        Args:
+            key: Cache key.
+            value_type: Type of value, e.g. model or list of models.
+        """
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, lifetime: float):
+        """Store value.
+
+        Args:
+            key: Cache key.
+            value: Pydantic model, list of them or other JSON-serializable value.
+            lifetime: Seconds after which value can be dropped (fresh and stale time together).
+        """
+        pass
+
+
+class MemoryResultCache(ResultCache):
+    """In-process LRU cache limited by total size of pickled values.
+
+    Attributes:
+        max_size: Max total size of values in bytes.
+    """
+
+    def __init__(self, max_size: int = 32 * 1024 * 1024):
+        self._max_size = max_size
+        self._size = 0
+        self._entries: OrderedDict[str, tuple[CacheEntry, float, int]] = OrderedDict()
+
+    def _delete(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+
+    async def get(self, key: str, value_type: Any) -> Optional[CacheEntry]:
+        if key not in self._entries:
+            return None
+        entry, expires_at, _ = self._entries[key]
+        if expires_at <= time.time():
+            self._delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, value: Any, lifetime: float):
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self._max_size:
+            return
+        if key in self._entries:
+            self._delete(key)
+        now = time.time()
+        self._entries[key] = (CacheEntry(value=value, stored_at=now), now + lifetime, size)
+        self._size += size
+        while self._size > self._max_size:
+            self._delete(next(iter(self._entries)))
+
+
+class RedisResultCache(ResultCache):
+    """Cache in Redis shared by bot and loader processes.
+
+    Values are stored as JSON and validated by their type on read.
+    Cache fails open: unavailable Redis or broken value is logged and
+    treated as cache miss, so value is fetched live.
+
+    Attributes:
+        redis: Asyncio Redis client without responses decoding.
+        prefix: Prefix of keys in Redis.
+    """
+
+    def __init__(self, redis, prefix: str = 'dodo-api-cache:'):
+        self._redis = redis
+        self._prefix = prefix
+
+    async def get(self, key: str, value_type: Any) -> Optional[CacheEntry]:
+        try:
+            raw = await self._redis.get(self._prefix + key)
+        except (RedisError, OSError) as error:
+            logger.warning(f'cached result {key} is not read: {error!r}')
+            return None
+        if raw is None:
+            return None
+        try:
+            data = json.loads(raw)
+            return CacheEntry(value=parse_obj_as(value_type, data['value']),
+                              stored_at=data['stored_at'])
+        except (ValueError, TypeError, KeyError) as error:
+            logger.warning(f'cached result {key} is broken: {type(error).__name__}')
+            return None
+
+    async def set(self, key: str, value: Any, lifetime: float):
+        try:
+            raw = json.dumps({'value': value, 'stored_at': time.time()},
+                             default=_encode_json, ensure_ascii=False)
+            await self._redis.set(self._prefix + key, raw, ex=math.ceil(lifetime))
+        except (RedisError, OSError, TypeError, ValueError) as error:
+            logger.warning(f'result {key} is not cached: {error!r}')
+
+
+def _encode_json(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        # Models are parsed by aliases of fields.
+        return value.dict(by_alias=True)
+    return pydantic_encoder(value)
+
+
+_result_cache: Optional[ResultCache] = MemoryResultCache()
+_refresh_tasks: set[asyncio.Task] = set()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    return _result_cache
+
+
+def set_result_cache(result_cache: Optional[ResultCache]):
+    """Replace cache of services' results. Pass None to disable caching."""
+    global _result_cache
+    _result_cache = result_cache
+
+
+def get_cache_key(key: Hashable) -> str:
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+async def _refresh(cache_key: str, fetch: Callable[[], Awaitable[Any]], lifetime: float):
+    value = await fetch()
+    await _result_cache.set(cache_key, value, lifetime)
+    return value
+
+
+async def get_or_fetch(key: Hashable, fetch: Callable[[], Awaitable[Any]],
+                       ttl: float, stale_ttl: float = 0, value_type: Any = Any) -> Any:
+    """Get value from cache or fetch it.
+
+    Value younger than ttl is returned as is. Value younger than ttl + stale_ttl
+    is returned too, but it's refreshed in background (stale-while-revalidate).
+    Older or missing value is fetched and stored.
+
+    Args:
+        key: Key of value.
+        fetch: Function that fetches actual value.
+        ttl: Seconds while value is fresh.
+        stale_ttl: Seconds after ttl while stale value may be returned.
+        value_type: Type of value that value read from cache is parsed to.
+
+    Returns:
+        Cached or fetched value.
+    """
+    if _result_cache is None:
+        return await fetch()
+    cache_key = get_cache_key(key)
+    lifetime = ttl + stale_ttl
+    entry = await _result_cache.get(cache_key, value_type)
+    if entry is not None:
+        age = time.time() - entry.stored_at
+        if age < ttl:
+            return entry.value
+        if age < lifetime:
+            task = asyncio.ensure_future(_refresh(cache_key, fetch, lifetime))
+            _refresh_tasks.add(task)
+            task.add_done_callback(_on_refresh_done)
+            return entry.value
+    return await _refresh(cache_key, fetch, lifetime)
+
+
+async def store(key: Hashable, value: Any, ttl: float, stale_ttl: float = 0):
+    """Store value fetched past cache, e.g. by poller that needs the current state,
+    so other callers of get_or_fetch with the same key get it from cache.
+    """
+    if _result_cache is None:
+        return
+    await _result_cache.set(get_cache_key(key), value, ttl + stale_ttl)
+
+
+def _on_refresh_done(task: asyncio.Task):
+    _refresh_tasks.discard(task)
+    if not task.cancelled():
+        # Stale value stays in cache if refresh failed, so error is ignored.
+        task.exception()
@@ -1,42 +1,267 @@
 import asyncio
-from typing import Iterable, NamedTuple
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Iterable, NamedTuple, Optional
+from urllib.parse import urlsplit
 
 import httpx
 
 from . import requests
+from .instrumentation import instrumentation
+from .limits import BACKGROUND_PRIORITY, RequestLimiter, default_limiter
+from .retries import RetryPolicy, circuit_breakers, default_retry_policy
+from .sessions import session_manager
+from .timeouts import AdaptiveTimeoutPolicy, default_timeout_policy
 from .utils import exceptions
 
 __all__ = (
     'run_requests',
     'run_request',
+    'run_batch',
+    'BatchRequest',
+    'BatchResult',
+    'SingleFlight',
+    'coalescer',
+    'get_request_key',
+    'close_sessions',
 )
 
 
 class DodoAPIResponse(NamedTuple):
+    """Response that keeps only raw body, text is decoded on access and isn't kept."""
     request: requests.DodoAPIRequest
-    html: str
     content: bytes
+    encoding: str = 'utf-8'
+
+    @property
+    def html(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+
+class BatchRequest(NamedTuple):
+    cookies: dict
+    request: requests.DodoAPIRequest
+    account_name: Optional[str] = None
+    priority: int = BACKGROUND_PRIORITY
+
+
+class BatchResult(NamedTuple):
+    request: requests.DodoAPIRequest
+    response: Optional[DodoAPIResponse]
+    error: Optional[Exception]
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one call.
+
+    The first caller starts the call, the others wait for its result
+    (or error) instead of starting the same call again.
+    Key is forgotten as soon as call is done, so nothing is cached.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # Mark exception as retrieved even if all callers were cancelled.
+            future.exception()
+
+    async def run(self, key: Hashable, coroutine_function: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(coroutine_function())
+            self._calls[key] = future
+            future.add_done_callback(lambda done_future: self._forget(key, done_future))
+        return await asyncio.shield(future)
+
+
+coalescer = SingleFlight()
+
+
+def _to_json_compatible(value: Any) -> Any:
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+
+def get_request_key(request: requests.DodoAPIRequest, account_name: Optional[str] = None,
+                    cookies: Optional[dict] = None) -> tuple[str, str, str, Optional[str]]:
+    """Get key of request that is equal for byte-identical requests of the same account.
+
+    Returns:
+        Method, URL, serialized params/json/data and account (or cookies) of request.
+    """
+    request_params = request.get_request_params()
+    serialized_params = json.dumps(
+        [request_params['params'], request_params['json'], request_params['data']],
+        sort_keys=True, default=_to_json_compatible, ensure_ascii=False,
+    )
+    return (request_params['method'], request_params['url'], serialized_params,
+            session_manager.get_session_key(account_name, cookies))
 
 
 async def run_request(cookies: dict, request: requests.DodoAPIRequest,
-                      times: int = 3) -> DodoAPIResponse:
-    headers = {
-        'User-Agent': 'Goretsky-Band'
-    }
-    async with httpx.AsyncClient(cookies=cookies) as client:
-        request_params = request.get_request_params()
+                      account_name: Optional[str] = None,
+                      limiter: Optional[RequestLimiter] = None,
+                      retry_policy: Optional[RetryPolicy] = None,
+                      priority: int = BACKGROUND_PRIORITY,
+                      timeout_policy: Optional[AdaptiveTimeoutPolicy] = None) -> DodoAPIResponse:
+    """Run request with retries.
+
+    Transport errors and responses with retryable status codes are retried
+    with backoff of retry policy. Failures are counted by circuit breaker
+    of request's URL, so requests to failing endpoint are rejected without network call.
+    Concurrent identical requests of the same account share one HTTP call.
+    Requests with interactive priority are dispatched ahead of background ones.
+    Timeout of request is learned from latencies of its endpoint, and slow
+    hedgeable request is sent once more, the first response is used.
+
+    Raises:
+        UnsuccessfulRequestError: If all attempts failed.
+        CircuitBreakerOpenError: If endpoint's circuit breaker is open.
+    """
+    key = ('request', *get_request_key(request, account_name, cookies))
+    response = await coalescer.run(key, lambda: _run_request(cookies, request, account_name,
+                                                             limiter, retry_policy, priority,
+                                                             timeout_policy))
+    if response.request is not request:
+        response = response._replace(request=request)
+    return response
+
+
+async def _run_request(cookies: dict, request: requests.DodoAPIRequest,
+                       account_name: Optional[str], limiter: Optional[RequestLimiter],
+                       retry_policy: Optional[RetryPolicy], priority: int,
+                       timeout_policy: Optional[AdaptiveTimeoutPolicy]) -> DodoAPIResponse:
+    limiter = limiter or default_limiter
+    retry_policy = retry_policy or default_retry_policy
+    timeout_policy = timeout_policy or default_timeout_policy
+    circuit_breaker = circuit_breakers.get(request.url)
+    client = session_manager.get_client(account_name, cookies)
+    request_params = request.get_request_params()
+    host = urlsplit(request.url).netloc
+
+    def send() -> Awaitable[httpx.Response]:
+        return client.request(**request_params, timeout=timeout)
+
+    async def send_hedge() -> httpx.Response:
+        async with limiter.limit(host, account_name, priority):
+            instrumentation.on_hedge(request, account_name)
+            return await send()
+
+    attempt = 0
+    while True:
+        try:
+            circuit_breaker.before_request(request.url)
+        except exceptions.CircuitBreakerOpenError as circuit_breaker_error:
+            instrumentation.on_failure(request, circuit_breaker_error)
+            raise
+        retry_after = transport_error = None
+        timeout = timeout_policy.get_timeout(request)
         try:
-            response = await client.request(**request_params, headers=headers)
-        except httpx.HTTPError:
-            if times <= 0:
-                raise exceptions.UnsuccessfulRequestError
-            return await run_request(cookies, request, times - 1)
-        return DodoAPIResponse(request=request, html=response.text, content=response.content)
+            async with limiter.limit(host, account_name, priority):
+                instrumentation.on_request_start(request, account_name)
+                started_at = time.monotonic()
+                response = await _send(send, send_hedge, timeout_policy.get_hedging_delay(request))
+        except httpx.HTTPError as error:
+            if isinstance(error, httpx.TimeoutException):
+                instrumentation.on_timeout(request, timeout)
+            circuit_breaker.record_failure()
+            transport_error = error
+        else:
+            instrumentation.on_response(request, response.status_code,
+                                        time.monotonic() - started_at, len(response.content))
+            if response.status_code >= 500:
+                circuit_breaker.record_failure()
+            else:
+                circuit_breaker.record_success()
+            if not retry_policy.is_retryable_status(response.status_code):
+                return DodoAPIResponse(request=request, content=response.content,
+                                       encoding=response.charset_encoding or 'utf-8')
+            retry_after = retry_policy.parse_retry_after(response.headers.get('Retry-After'))
+        if attempt >= retry_policy.max_retries:
+            error = exceptions.UnsuccessfulRequestError(request.url)
+            instrumentation.on_failure(request, error)
+            raise error
+        delay = retry_policy.get_delay(attempt, retry_after)
+        instrumentation.on_retry(request, attempt, delay, transport_error)
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def _send(send: Callable[[], Awaitable[httpx.Response]],
+                send_hedge: Callable[[], Awaitable[httpx.Response]],
+                hedging_delay: Optional[float]) -> httpx.Response:
+    """Send request, and if hedging delay is passed and request isn't done by then,
+    send its copy and return whichever successful response comes first.
+    Copy takes its own slot of limiter, so it may wait for it.
+    """
+    first = asyncio.ensure_future(send())
+    if hedging_delay is None:
+        return await first
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedging_delay)
+        if not done:
+            tasks.add(asyncio.ensure_future(send_hedge()))
+        while True:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            successful = [task for task in done if task.exception() is None]
+            if successful:
+                return successful[0].result()
+            if not tasks:
+                return done.pop().result()
+    finally:
+        for task in tasks:
+            task.cancel()
 
 
 async def run_requests(
         cookies: dict,
-        executable_requests: Iterable[requests.DodoAPIRequest]
+        executable_requests: Iterable[requests.DodoAPIRequest],
+        account_name: Optional[str] = None,
 ) -> tuple[DodoAPIResponse, ...]:
-    tasks = [run_request(cookies, request) for request in executable_requests]
+    tasks = [run_request(cookies, request, account_name=account_name)
+             for request in executable_requests]
     return await asyncio.gather(*tasks)
+
+
+async def run_batch(
+        batch_requests: Iterable[BatchRequest],
+        limiter: Optional[RequestLimiter] = None,
+) -> AsyncIterator[BatchResult]:
+    """Run many requests concurrently within limits of limiter.
+
+    Args:
+        batch_requests: Requests with cookies and name of account.
+        limiter: Limiter of in-flight requests and rate. Default one is used if not passed.
+
+    Yields:
+        Results in order of completion. Failed request doesn't stop
+        the batch, its result contains error instead of response.
+    """
+
+    async def run(batch_request: BatchRequest) -> BatchResult:
+        try:
+            response = await run_request(batch_request.cookies, batch_request.request,
+                                         account_name=batch_request.account_name,
+                                         limiter=limiter, priority=batch_request.priority)
+        except Exception as error:
+            return BatchResult(request=batch_request.request, response=None, error=error)
+        return BatchResult(request=batch_request.request, response=response, error=None)
+
+    tasks = [asyncio.ensure_future(run(batch_request)) for batch_request in batch_requests]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def close_sessions():
+    """Close all shared HTTP sessions. Call it on shutdown."""
+    await session_manager.close_all()
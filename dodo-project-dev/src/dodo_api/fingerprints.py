@@ -0,0 +1,43 @@
+import hashlib
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+__all__ = (
+    'get_fingerprint',
+    'FingerprintStore',
+    'response_fingerprints',
+)
+
+
+def get_fingerprint(content: bytes) -> bytes:
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+
+class FingerprintStore:
+    """Fingerprints of the last handled raw responses by request key.
+
+    Attributes:
+        max_size: Max amount of stored fingerprints, the least recently used are dropped.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self._max_size = max_size
+        self._fingerprints: OrderedDict[Hashable, bytes] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        fingerprint = self._fingerprints.get(key)
+        if fingerprint is not None:
+            self._fingerprints.move_to_end(key)
+        return fingerprint
+
+    def remember(self, key: Hashable, fingerprint: bytes):
+        self._fingerprints[key] = fingerprint
+        self._fingerprints.move_to_end(key)
+        while len(self._fingerprints) > self._max_size:
+            self._fingerprints.popitem(last=False)
+
+    def forget(self, key: Hashable):
+        self._fingerprints.pop(key, None)
+
+
+response_fingerprints = FingerprintStore()
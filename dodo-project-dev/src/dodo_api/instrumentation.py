@@ -0,0 +1,199 @@
+import bisect
+import math
+from collections import defaultdict
+from typing import Optional
+
+from . import requests
+
+__all__ = (
+    'Instrument',
+    'Instrumentation',
+    'Histogram',
+    'MetricsCollector',
+    'instrumentation',
+    'metrics',
+)
+
+# Upper bounds of histograms' buckets in seconds.
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, math.inf)
+
+
+class Instrument:
+    """Receiver of events of requests and parsing. All hooks do nothing by default."""
+
+    def on_request_start(self, request: requests.DodoAPIRequest, account_name: Optional[str]):
+        pass
+
+    def on_hedge(self, request: requests.DodoAPIRequest, account_name: Optional[str]):
+        pass
+
+    def on_response(self, request: requests.DodoAPIRequest, status_code: int,
+                    elapsed: float, size: int):
+        pass
+
+    def on_timeout(self, request: requests.DodoAPIRequest, timeout: float):
+        pass
+
+    def on_retry(self, request: requests.DodoAPIRequest, attempt: int, delay: float,
+                 error: Optional[Exception]):
+        pass
+
+    def on_failure(self, request: requests.DodoAPIRequest, error: Exception):
+        pass
+
+    def on_parse_done(self, service_name: str, elapsed: float):
+        pass
+
+
+class Instrumentation(Instrument):
+    """Dispatches events to all added instruments.
+    Failed instrument doesn't affect requests and other instruments.
+    """
+
+    def __init__(self):
+        self._instruments: list[Instrument] = []
+
+    def add(self, instrument: Instrument):
+        self._instruments.append(instrument)
+
+    def remove(self, instrument: Instrument):
+        self._instruments.remove(instrument)
+
+    def _dispatch(self, hook_name: str, *args):
+        for instrument in self._instruments:
+            try:
+                getattr(instrument, hook_name)(*args)
+            except Exception:
+                pass
+
+    def on_request_start(self, request, account_name):
+        self._dispatch('on_request_start', request, account_name)
+
+    def on_hedge(self, request, account_name):
+        self._dispatch('on_hedge', request, account_name)
+
+    def on_response(self, request, status_code, elapsed, size):
+        self._dispatch('on_response', request, status_code, elapsed, size)
+
+    def on_timeout(self, request, timeout):
+        self._dispatch('on_timeout', request, timeout)
+
+    def on_retry(self, request, attempt, delay, error):
+        self._dispatch('on_retry', request, attempt, delay, error)
+
+    def on_failure(self, request, error):
+        self._dispatch('on_failure', request, error)
+
+    def on_parse_done(self, service_name, elapsed):
+        self._dispatch('on_parse_done', service_name, elapsed)
+
+
+class Histogram:
+    """Cumulative histogram of durations in seconds.
+
+    Attributes:
+        buckets: Sorted upper bounds of buckets, the last one must be infinity.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def get_percentile(self, percentile: float) -> float:
+        """Get upper bound of bucket that contains percentile (from 0 to 100)."""
+        rank = self.count * percentile / 100
+        total = 0
+        for bucket, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return bucket
+        return math.inf
+
+
+class MetricsCollector(Instrument):
+    """Collects per-endpoint latency, response size, hedges, timeouts, retries and failures,
+    and per-service parse durations. Endpoint is name of request's class.
+    """
+
+    def __init__(self):
+        self.latencies: defaultdict[str, Histogram] = defaultdict(Histogram)
+        self.response_bytes: defaultdict[str, int] = defaultdict(int)
+        self.responses: defaultdict[tuple[str, int], int] = defaultdict(int)
+        self.hedges: defaultdict[str, int] = defaultdict(int)
+        self.timeouts: defaultdict[str, int] = defaultdict(int)
+        self.retries: defaultdict[str, int] = defaultdict(int)
+        self.failures: defaultdict[str, int] = defaultdict(int)
+        self.parse_durations: defaultdict[str, Histogram] = defaultdict(Histogram)
+
+    @staticmethod
+    def get_endpoint(request: requests.DodoAPIRequest) -> str:
+        return type(request).__name__
+
+    def on_response(self, request, status_code, elapsed, size):
+        endpoint = self.get_endpoint(request)
+        self.latencies[endpoint].observe(elapsed)
+        self.response_bytes[endpoint] += size
+        self.responses[endpoint, status_code] += 1
+
+    def on_hedge(self, request, account_name):
+        self.hedges[self.get_endpoint(request)] += 1
+
+    def on_timeout(self, request, timeout):
+        self.timeouts[self.get_endpoint(request)] += 1
+
+    def on_retry(self, request, attempt, delay, error):
+        self.retries[self.get_endpoint(request)] += 1
+
+    def on_failure(self, request, error):
+        self.failures[self.get_endpoint(request)] += 1
+
+    def on_parse_done(self, service_name, elapsed):
+        self.parse_durations[service_name].observe(elapsed)
+
+    @staticmethod
+    def _format_histogram(name: str, label: str, histograms: dict[str, Histogram]) -> list[str]:
+        lines = [f'# TYPE {name} histogram']
+        for label_value, histogram in sorted(histograms.items()):
+            cumulative_count = 0
+            for bucket, count in zip(histogram.buckets, histogram.counts):
+                cumulative_count += count
+                le = '+Inf' if bucket == math.inf else bucket
+                lines.append(f'{name}_bucket{{{label}="{label_value}",le="{le}"}} {cumulative_count}')
+            lines.append(f'{name}_sum{{{label}="{label_value}"}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{{label}="{label_value}"}} {histogram.count}')
+        return lines
+
+    @staticmethod
+    def _format_counter(name: str, label: str, counters: dict[str, int]) -> list[str]:
+        lines = [f'# TYPE {name} counter']
+        lines += [f'{name}{{{label}="{label_value}"}} {value}'
+                  for label_value, value in sorted(counters.items())]
+        return lines
+
+    def get_snapshot(self) -> str:
+        """Get metrics in Prometheus text format."""
+        lines = self._format_histogram('dodo_api_request_duration_seconds', 'endpoint',
+                                       self.latencies)
+        lines += ['# TYPE dodo_api_responses_total counter']
+        lines += [f'dodo_api_responses_total{{endpoint="{endpoint}",status="{status_code}"}} {value}'
+                  for (endpoint, status_code), value in sorted(self.responses.items())]
+        lines += self._format_counter('dodo_api_response_bytes_total', 'endpoint', self.response_bytes)
+        lines += self._format_counter('dodo_api_hedged_requests_total', 'endpoint', self.hedges)
+        lines += self._format_counter('dodo_api_timeouts_total', 'endpoint', self.timeouts)
+        lines += self._format_counter('dodo_api_retries_total', 'endpoint', self.retries)
+        lines += self._format_counter('dodo_api_failures_total', 'endpoint', self.failures)
+        lines += self._format_histogram('dodo_api_parse_duration_seconds', 'service',
+                                        self.parse_durations)
+        return '\n'.join(lines) + '\n'
+
+
+instrumentation = Instrumentation()
+metrics = MetricsCollector()
+instrumentation.add(metrics)
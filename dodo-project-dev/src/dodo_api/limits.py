@@ -0,0 +1,258 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from loguru import logger
+from redis.exceptions import RedisError
+
+__all__ = (
+    'INTERACTIVE_PRIORITY',
+    'BACKGROUND_PRIORITY',
+    'TokenBucket',
+    'PrioritySemaphore',
+    'InteractiveActivity',
+    'MemoryInteractiveActivity',
+    'RedisInteractiveActivity',
+    'RequestLimiter',
+    'default_limiter',
+    'set_interactive_activity',
+)
+
+# Lower value is dispatched first.
+INTERACTIVE_PRIORITY = 0
+BACKGROUND_PRIORITY = 1
+
+
+class TokenBucket:
+    """Token bucket rate limiter.
+
+    Attributes:
+        rate: Tokens added per second.
+        capacity: Max amount of tokens, i.e. allowed burst size.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """Wait until token is available and take it."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class PrioritySemaphore:
+    """Semaphore that gives released slot to the waiter with the highest priority
+    (the lowest value), waiters with equal priority are served in FIFO order.
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    async def acquire(self, priority: int = BACKGROUND_PRIORITY):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was given to this waiter just before cancellation, pass it on.
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+    @contextlib.asynccontextmanager
+    async def hold(self, priority: int = BACKGROUND_PRIORITY):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class InteractiveActivity(ABC):
+    """Marks of accounts whose interactive requests (of users waiting in Telegram)
+    are in progress, shared between processes of bot and loader.
+    """
+
+    @abstractmethod
+    async def mark(self, account_name: Optional[str]):
+        pass
+
+    @abstractmethod
+    async def is_active(self, account_name: Optional[str]) -> bool:
+        pass
+
+
+class MemoryInteractiveActivity(InteractiveActivity):
+    """In-process marks.
+
+    Attributes:
+        lifetime: Seconds while account is active after the last mark.
+    """
+
+    def __init__(self, lifetime: float = 5):
+        self._lifetime = lifetime
+        self._marked_at: dict[Optional[str], float] = {}
+
+    async def mark(self, account_name: Optional[str]):
+        self._marked_at[account_name] = time.monotonic()
+
+    async def is_active(self, account_name: Optional[str]) -> bool:
+        marked_at = self._marked_at.get(account_name)
+        return marked_at is not None and time.monotonic() - marked_at < self._lifetime
+
+
+class RedisInteractiveActivity(InteractiveActivity):
+    """Marks in Redis, so requests of bot pause background requests of loader.
+
+    Mark of account is checked in Redis once per check interval, and concurrent
+    requests of account share the check. If Redis is unavailable, accounts are
+    considered inactive, so background requests aren't paused.
+
+    Attributes:
+        redis: Asyncio Redis client.
+        lifetime: Seconds while account is active after the last mark.
+        prefix: Prefix of keys in Redis.
+        check_interval: Seconds while result of check of account is reused.
+    """
+
+    def __init__(self, redis, lifetime: float = 5, prefix: str = 'dodo-api-interactive:',
+                 check_interval: float = 0.5):
+        self._redis = redis
+        self._lifetime = lifetime
+        self._prefix = prefix
+        self._check_interval = check_interval
+        self._checks: dict[Optional[str], tuple[float, asyncio.Future]] = {}
+
+    async def mark(self, account_name: Optional[str]):
+        try:
+            await self._redis.set(f'{self._prefix}{account_name}', 1,
+                                  px=int(self._lifetime * 1000))
+        except (RedisError, OSError) as error:
+            logger.warning(f'interactive request of {account_name} is not marked: {error!r}')
+
+    async def _is_marked(self, account_name: Optional[str]) -> bool:
+        try:
+            return bool(await self._redis.exists(f'{self._prefix}{account_name}'))
+        except (RedisError, OSError) as error:
+            logger.warning(f'activity of {account_name} is not checked: {error!r}')
+            return False
+
+    async def is_active(self, account_name: Optional[str]) -> bool:
+        checked_at, check = self._checks.get(account_name, (0.0, None))
+        if check is None or time.monotonic() - checked_at >= self._check_interval:
+            check = asyncio.ensure_future(self._is_marked(account_name))
+            self._checks[account_name] = (time.monotonic(), check)
+        # Shielded, so cancellation of one request doesn't cancel check shared with others.
+        return await asyncio.shield(check)
+
+
+_interactive_activity: Optional[InteractiveActivity] = MemoryInteractiveActivity()
+
+
+def set_interactive_activity(interactive_activity: Optional[InteractiveActivity]):
+    """Replace marks of interactive requests. Pass None to disable pausing of background requests."""
+    global _interactive_activity
+    _interactive_activity = interactive_activity
+
+
+class RequestLimiter:
+    """Limits amount of in-flight requests per host and per account,
+    and rate of requests per account.
+
+    Attributes:
+        max_per_host: Max amount of in-flight requests to one host.
+        max_per_account: Max amount of in-flight requests of one account.
+        rate_per_account: Requests per second allowed for one account.
+        burst_per_account: Max burst of requests for one account.
+        max_background_pause: Max seconds that background request waits
+            while interactive requests of its account are in progress.
+    """
+
+    def __init__(self, max_per_host: int = 16, max_per_account: int = 8,
+                 rate_per_account: float = 10, burst_per_account: int = 20,
+                 max_background_pause: float = 5):
+        self._max_per_host = max_per_host
+        self._max_per_account = max_per_account
+        self._rate_per_account = rate_per_account
+        self._burst_per_account = burst_per_account
+        self._max_background_pause = max_background_pause
+        self._host_semaphores: dict[str, PrioritySemaphore] = {}
+        self._account_semaphores: dict[Optional[str], PrioritySemaphore] = {}
+        self._account_buckets: dict[Optional[str], TokenBucket] = {}
+
+    def _get_host_semaphore(self, host: str) -> PrioritySemaphore:
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = PrioritySemaphore(self._max_per_host)
+        return self._host_semaphores[host]
+
+    def _get_account_semaphore(self, account_name: Optional[str]) -> PrioritySemaphore:
+        if account_name not in self._account_semaphores:
+            self._account_semaphores[account_name] = PrioritySemaphore(self._max_per_account)
+        return self._account_semaphores[account_name]
+
+    def _get_account_bucket(self, account_name: Optional[str]) -> TokenBucket:
+        if account_name not in self._account_buckets:
+            self._account_buckets[account_name] = TokenBucket(self._rate_per_account,
+                                                              self._burst_per_account)
+        return self._account_buckets[account_name]
+
+    async def _wait_for_interactive_requests(self, account_name: Optional[str]):
+        paused_at = time.monotonic()
+        while (time.monotonic() - paused_at < self._max_background_pause
+               and await _interactive_activity.is_active(account_name)):
+            await asyncio.sleep(0.1)
+
+    @contextlib.asynccontextmanager
+    async def limit(self, host: str, account_name: Optional[str] = None,
+                    priority: int = BACKGROUND_PRIORITY):
+        """Hold request slot of host and account until exit from context manager.
+
+        Waiting requests with higher priority get slots first. Interactive request
+        marks its account as active, and background requests of active account
+        (even in another process) wait until it's over, but not longer than max pause.
+        """
+        if _interactive_activity is not None:
+            if priority == INTERACTIVE_PRIORITY:
+                await _interactive_activity.mark(account_name)
+            else:
+                await self._wait_for_interactive_requests(account_name)
+        account_semaphore = self._get_account_semaphore(account_name)
+        host_semaphore = self._get_host_semaphore(host)
+        async with account_semaphore.hold(priority), host_semaphore.hold(priority):
+            await self._get_account_bucket(account_name).acquire()
+            yield
+
+
+default_limiter = RequestLimiter()
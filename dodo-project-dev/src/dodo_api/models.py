@@ -15,6 +15,7 @@ __all__ = (
     'DeliveryStatisticsRow',
     'IngredientStopSaleReport',
     'StopSaleReportType',
+    'StopSaleEventType',
     'DeliveryStatistics',
     'BeingLateCertificate',
     'Department',
@@ -143,6 +144,12 @@ class StopSaleReportType(Enum):
     INGREDIENT = 'ingredient'
 
 
+class StopSaleEventType(str, Enum):
+    STOPPED = 'stopped'
+    STILL_STOPPED = 'still_stopped'
+    RESUMED = 'resumed'
+
+
 class PizzeriaStopSaleReport(BaseModel):
     department: str
     sale_type: str
@@ -150,6 +157,7 @@ class PizzeriaStopSaleReport(BaseModel):
     stopped_at: pendulum.DateTime
     stopper_name: str
     renewer_name: Optional[str]
+    event: StopSaleEventType = StopSaleEventType.STOPPED
     stop_type: str
 
     _set_renewer_name_as_none = validator(
@@ -171,6 +179,7 @@ class StreetStopSaleReport(BaseModel):
     stopped_at: pendulum.DateTime
     stopper_name: str
     renewer_name: Optional[str]
+    event: StopSaleEventType = StopSaleEventType.STOPPED
 
     _set_renewer_name_as_none = validator(
         'renewer_name',
@@ -190,6 +199,7 @@ class SectorStopSaleReport(BaseModel):
     stopped_at: pendulum.DateTime
     stopper_name: str
     renewer_name: Optional[str]
+    event: StopSaleEventType = StopSaleEventType.STOPPED
 
     _to_lower = validator(
         'department',
@@ -215,6 +225,7 @@ class IngredientStopSaleReport(BaseModel):
     stopped_at: pendulum.DateTime
     stopper_name: str
     renewer_name: Optional[str]
+    event: StopSaleEventType = StopSaleEventType.STOPPED
 
     _to_lower = validator(
         'department',
@@ -1,6 +1,7 @@
+import io
 import pathlib
 from abc import abstractmethod, ABC
-from typing import Union
+from typing import BinaryIO, Iterator, Union
 
 import openpyxl as openpyxl
 
@@ -12,13 +13,18 @@ __all__ = (
 
 
 class ExcelParser(ABC):
-    __slots__ = ('_file_path', '_wb', '_ws',)
+    """Parser of workbook's active sheet. Use only with context manager!
 
-    def __init__(self, file_path: Union[str, pathlib.Path]):
-        self._file_path = file_path
+    Attributes:
+        file: Path to workbook, file-like object or workbook content itself.
+    """
+    __slots__ = ('_file', '_wb', '_ws',)
+
+    def __init__(self, file: Union[str, pathlib.Path, bytes, BinaryIO]):
+        self._file = io.BytesIO(file) if isinstance(file, bytes) else file
 
     def __enter__(self):
-        self._wb = openpyxl.load_workbook(self._file_path, read_only=True)
+        self._wb = openpyxl.load_workbook(self._file, read_only=True)
         self._ws = self._wb.active
         return self
 
@@ -32,13 +38,16 @@ class ExcelParser(ABC):
 
 class DeliveryStatisticsExcelParser(ExcelParser):
 
+    def iter_data(self) -> Iterator[DeliveryStatisticsRow]:
+        """Lazily parse rows. Must be consumed before exit from context manager."""
+        for row in self._ws.iter_rows(min_row=7, max_col=7, values_only=True):
+            if not any(row):
+                continue
+            yield DeliveryStatisticsRow(department=row[0],
+                                        total_average_time=row[3],
+                                        average_cooking_time=row[4],
+                                        average_awaiting_on_heat_shelf_time=row[5],
+                                        average_delivery_time=row[6])
+
     def get_data(self) -> list[DeliveryStatisticsRow]:
-        rows = self._ws['A7': f'G{self._ws.max_row}']
-        parsed_rows = [[cell.value for cell in row] for row in rows]
-        filtered_rows = [row for row in parsed_rows if any(row)]
-        return [DeliveryStatisticsRow(department=row[0],
-                                      total_average_time=row[3],
-                                      average_cooking_time=row[4],
-                                      average_awaiting_on_heat_shelf_time=row[5],
-                                      average_delivery_time=row[6])
-                for row in filtered_rows]
+        return list(self.iter_data())
@@ -1,7 +1,12 @@
+import io
 import unicodedata
 from abc import abstractmethod, ABC
+from typing import Any, Mapping, NamedTuple, Optional, Union
 
-from bs4 import BeautifulSoup
+import lxml.html
+from bs4 import BeautifulSoup, SoupStrainer
+from lxml import etree
+from loguru import logger
 
 from .. import models
 
@@ -16,16 +21,245 @@ __all__ = (
     'StreetStopSalesHTMLParser',
     'IngredientStopSalesHTMLParser',
     'SectorStopSalesHTMLParser',
+    'RestaurantOrdersParser',
+    'SOUP_BACKEND',
+    'LXML_BACKEND',
+    'Target',
+    'Document',
+    'SoupDocument',
+    'LxmlDocument',
 )
 
+SOUP_BACKEND = 'soup'
+LXML_BACKEND = 'lxml'
 
-class HTMLParser(ABC):
 
-    def __init__(self, html: str):
-        self._soup = BeautifulSoup(html, 'lxml')
+def has_class(tag: str, class_name: str) -> str:
+    """XPath of tags that have class among others, like "class_" of BeautifulSoup."""
+    return f'.//{tag}[contains(concat(" ", normalize-space(@class), " "), " {class_name} ")]'
+
+
+# Like "text_content" of lxml.html, but also for elements of iterparse,
+# and returns plain str, so parsed values don't keep references to the whole tree.
+_get_string = etree.XPath('string()', smart_strings=False)
+
+
+def get_text(element: etree.ElementBase) -> str:
+    return _get_string(element)
+
+
+class Target(NamedTuple):
+    """Elements looked up by parser: tag with optional id or class."""
+    tag: str
+    id: Optional[str] = None
+    class_: Optional[str] = None
+
+    def get_xpath(self) -> str:
+        if self.id is not None:
+            return f'.//{self.tag}[@id="{self.id}"]'
+        if self.class_ is not None:
+            return has_class(self.tag, self.class_)
+        return f'.//{self.tag}'
+
+    def matches(self, tag: str, attributes: Mapping[str, Any]) -> bool:
+        """Whether element with tag and attributes is target, like its XPath."""
+        if tag != self.tag:
+            return False
+        if self.id is not None:
+            return attributes.get('id') == self.id
+        if self.class_ is not None:
+            classes = attributes.get('class') or ''
+            if not isinstance(classes, str):
+                classes = ' '.join(classes)
+            return self.class_ in classes.split()
+        return True
+
+
+def get_targets_strainer(targets: tuple[Target, ...]) -> SoupStrainer:
+    """Get strainer of BeautifulSoup that keeps at least elements of targets with their content.
+
+    Strainer matches one tag and attribute at a time, so for targets of different tags
+    it keeps all their combinations, and if targets are narrowed by different attributes,
+    it keeps all elements of their tags.
+    """
+    tags = sorted({target.tag for target in targets})
+    if all(target.id is not None for target in targets):
+        return SoupStrainer(tags, id=sorted({target.id for target in targets}))
+    if all(target.id is None and target.class_ is not None for target in targets):
+        return SoupStrainer(tags, class_=sorted({target.class_ for target in targets}))
+    return SoupStrainer(tags)
+
 
+class Document(ABC):
+    """Parsed page with the same lookups for every backend,
+    so parsers extract data once for both of them.
+
+    Lookups return elements of backend, which are passed back to document
+    to get their text or attributes.
+    """
+
+    @property
     @abstractmethod
+    def root(self) -> Any:
+        pass
+
+    @abstractmethod
+    def find_all(self, target: Target, root: Any = None) -> list:
+        """Get all elements of target inside root (the whole page by default) in document order."""
+        pass
+
+    @abstractmethod
+    def get_text(self, element: Any) -> str:
+        pass
+
+    def get_attribute(self, element: Any, name: str) -> Optional[str]:
+        return element.get(name)
+
+    def find(self, target: Target, root: Any = None) -> Any:
+        """Get the first element of target.
+
+        Raises:
+            IndexError: If there is no such element.
+        """
+        return self.find_all(target, root)[0]
+
+    def get_rows(self, root: Any = None) -> list[list[str]]:
+        """Get stripped texts of cells of every row of table."""
+        return [[self.get_text(td).strip() for td in self.find_all(Target('td'), tr)]
+                for tr in self.find_all(Target('tr'), root)]
+
+
+class SoupDocument(Document):
+
+    def __init__(self, soup: BeautifulSoup):
+        self._soup = soup
+
+    @property
+    def root(self) -> BeautifulSoup:
+        return self._soup
+
+    def find_all(self, target, root=None):
+        attrs = {}
+        if target.id is not None:
+            attrs['id'] = target.id
+        if target.class_ is not None:
+            attrs['class_'] = target.class_
+        return (self._soup if root is None else root).find_all(target.tag, **attrs)
+
+    def get_text(self, element):
+        return element.text
+
+
+class LxmlDocument(Document):
+
+    def __init__(self, tree: etree.ElementBase):
+        self._tree = tree
+
+    @property
+    def root(self) -> etree.ElementBase:
+        return self._tree
+
+    def find_all(self, target, root=None):
+        return (self._tree if root is None else root).xpath(target.get_xpath())
+
+    def get_text(self, element):
+        return get_text(element)
+
+
+class HTMLParser(ABC):
+    """Base HTML parser with two backends.
+
+    Every parser extracts data in "parse_document" through lookups of "Document",
+    which are implemented by both backends. lxml backend is several times faster
+    on large tables. If page doesn't have expected elements for lxml backend,
+    BeautifulSoup backend is used as fallback, since it repairs broken markup differently.
+    Other errors, e.g. validation of parsed data, aren't retried.
+
+    Parser may declare "targets" - elements of page it needs, which must not be nested
+    in each other. Then lxml backend keeps only these elements: page is read with iterparse,
+    targets are moved under one root, and everything else is freed as soon as it's read.
+    BeautifulSoup backend builds tree only of elements kept by strainer of targets.
+    Parser without targets gets the whole page.
+
+    Attributes:
+        html: HTML page, either text or raw bytes. Bytes are parsed without decoding to text first.
+        backend: Backend of parser, "backend" of parser's class by default.
+        encoding: Encoding of raw bytes of page.
+    """
+    backend = LXML_BACKEND
+    targets: tuple[Target, ...] = ()
+
+    def __init__(self, html: Union[str, bytes], backend: Optional[str] = None,
+                 encoding: str = 'utf-8'):
+        self._html = html
+        self._backend = backend or self.backend
+        self._encoding = encoding
+        self.__soup: Optional[BeautifulSoup] = None
+        self.__tree: Optional[etree.ElementBase] = None
+
+    @property
+    def _soup(self) -> BeautifulSoup:
+        if self.__soup is None:
+            parse_only = get_targets_strainer(self.targets) if self.targets else None
+            if isinstance(self._html, bytes):
+                self.__soup = BeautifulSoup(self._html, 'lxml', parse_only=parse_only,
+                                            from_encoding=self._encoding)
+            else:
+                self.__soup = BeautifulSoup(self._html, 'lxml', parse_only=parse_only)
+        return self.__soup
+
+    @property
+    def _tree(self) -> etree.ElementBase:
+        if self.__tree is None:
+            if self.targets:
+                self.__tree = self.get_targets_tree()
+            elif isinstance(self._html, bytes):
+                parser = lxml.html.HTMLParser(encoding=self._encoding)
+                self.__tree = lxml.html.document_fromstring(self._html, parser=parser)
+            else:
+                self.__tree = lxml.html.document_fromstring(self._html)
+        return self.__tree
+
+    def is_target(self, tag: str, attributes: Mapping[str, Any]) -> bool:
+        return any(target.matches(tag, attributes) for target in self.targets)
+
+    def get_targets_tree(self) -> etree.ElementBase:
+        """Read page with lxml keeping only elements of targets, in document order under one root."""
+        if isinstance(self._html, bytes):
+            html, encoding = self._html, self._encoding
+        else:
+            html, encoding = self._html.encode(), 'utf-8'
+        root = etree.Element('targets')
+        tags = {target.tag for target in self.targets}
+        # Amount of targets that are open at the moment, their content is kept.
+        depth = 0
+        for event, element in etree.iterparse(io.BytesIO(html), events=('start', 'end'),
+                                              html=True, encoding=encoding,
+                                              remove_comments=True):
+            is_target = element.tag in tags and self.is_target(element.tag, element.attrib)
+            if event == 'start':
+                depth += is_target
+            elif is_target:
+                depth -= 1
+                if not depth:
+                    root.append(element)
+            elif not depth:
+                element.clear()
+                # Previous siblings are read and cleared already.
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+        return root
+
     def parse(self):
+        if self._backend == LXML_BACKEND:
+            try:
+                return self.parse_document(LxmlDocument(self._tree))
+            except (IndexError, AttributeError) as error:
+                logger.warning(f'{type(self).__name__} falls back to BeautifulSoup: {error!r}')
+        return self.parse_document(SoupDocument(self._soup))
+
+    @abstractmethod
+    def parse_document(self, document: Document):
         pass
 
     @staticmethod
@@ -37,16 +271,16 @@ class HTMLParser(ABC):
 
 
 class BeingLateCertificatesTableParser(HTMLParser):
+    backend = LXML_BACKEND
 
-    def parse(self) -> list:
-        if 'данные не найдены' in self._soup.text.lower():
+    def parse_document(self, document: Document) -> list:
+        if 'данные не найдены' in document.get_text(document.root).lower():
             return []
-        table_with_certificates = self._soup.find_all('table')[1]
+        table_with_certificates = document.find_all(Target('table'))[1]
         result = []
-        for tr in table_with_certificates.find_all('tr')[1:]:
+        for tds in document.get_rows(table_with_certificates)[1:]:
             (department, datetime, order_no, approximately_delivery_time,
-             courier_mark_at, delivery_deadline, certificate_type, given_by
-             ) = [td.text.strip() for td in tr.find_all('td')]
+             courier_mark_at, delivery_deadline, certificate_type, given_by) = tds
             datetime = datetime.replace('\t', '').replace('\r', '').replace('\n', ' ').replace(
                 '  ', ' ')
             result.append(models.BeingLateCertificate(
@@ -63,33 +297,39 @@ class BeingLateCertificatesTableParser(HTMLParser):
 
 
 class CanceledOrderByUUIDHTMLParser(HTMLParser):
-
-    def __init__(self, html: str, order_uuid: str, order_price: str, order_type: str):
-        super().__init__(html)
+    backend = LXML_BACKEND
+    targets = (
+        Target('span', id='orderNumber'),
+        Target('div', class_='headerDepartment'),
+        Target('div', id='history'),
+    )
+
+    def __init__(self, html: Union[str, bytes], order_uuid: str, order_price: str,
+                 order_type: str, backend: Optional[str] = None, encoding: str = 'utf-8'):
+        super().__init__(html, backend, encoding)
         self._order_uuid = order_uuid
         self._order_price = order_price
         self._order_type = order_type
 
-    def parse(self) -> models.CanceledOrderReport:
-        order_no = self._soup.find('span', id='orderNumber').text
-        department = self._soup.find('div', class_='headerDepartment').text
-        history = self._soup.find('div', id='history')
-        trs = history.find_all('tr')[1:]
+    def parse_document(self, document: Document) -> models.CanceledOrderReport:
+        order_no = document.get_text(document.find(Target('span', id='orderNumber')))
+        department = document.get_text(document.find(Target('div', class_='headerDepartment')))
+        history = document.find(Target('div', id='history'))
+        trs = [[document.get_text(td) for td in document.find_all(Target('td'), tr)]
+               for tr in document.find_all(Target('tr'), history)[1:]]
         order_created_at = receipt_printed_at = None
         is_receipt_printed = False
-        for tr in trs:
-            _, msg, _ = tr.find_all('td')
-            msg = msg.text.lower().strip()
+        for _, msg, _ in trs:
+            msg = msg.lower().strip()
             if 'refund receipt' in msg and 'has been printed' in msg:
                 is_receipt_printed = True
                 break
-        for tr in trs:
-            dt, msg, _ = tr.find_all('td')
-            msg = msg.text.lower().strip()
+        for dt, msg, _ in trs:
+            msg = msg.lower().strip()
             if 'has been accepted' in msg:
-                order_created_at = dt.text
+                order_created_at = dt
             elif 'has been rejected' in msg and is_receipt_printed:
-                receipt_printed_at = dt.text
+                receipt_printed_at = dt
         return models.CanceledOrderReport(
             order_no=order_no,
             department=department,
@@ -102,22 +342,28 @@ class CanceledOrderByUUIDHTMLParser(HTMLParser):
 
 
 class CanceledOrderUUIDsParser(HTMLParser):
-
-    def parse(self):
-        trs = self._soup.find_all('tr')[1:]
-        nested_trs = [tr.find_all('td') for tr in trs]
-        return [{'order_uuid': td[0].find('a').get('href').split('=')[-1],
-                 'order_no': td[1].text.strip(),
-                 'order_price': td[4].text.strip('₽').strip(),
-                 'order_type': td[7].text}
+    backend = LXML_BACKEND
+    targets = (Target('table'),)
+
+    def parse_document(self, document: Document):
+        trs = document.find_all(Target('tr'))[1:]
+        nested_trs = [document.find_all(Target('td'), tr) for tr in trs]
+        return [{'order_uuid': document.get_attribute(document.find(Target('a'), td[0]),
+                                                      'href').split('=')[-1],
+                 'order_no': document.get_text(td[1]).strip(),
+                 'order_price': document.get_text(td[4]).strip('₽').strip(),
+                 'order_type': document.get_text(td[7])}
                 for td in nested_trs]
 
 
 class DeliveryStatisticsHTMLParser(HTMLParser):
+    backend = LXML_BACKEND
+    targets = (Target('h1', class_='operationalStatistics_panelTitle'),)
 
-    def parse(self) -> models.DeliveryStatistics:
-        statistics_data = self._soup.find_all('h1', class_='operationalStatistics_panelTitle')
-        required_data = [self.clear_extra_symbols(block.text) for block in statistics_data]
+    def parse_document(self, document: Document) -> models.DeliveryStatistics:
+        statistics_data = document.find_all(Target('h1', class_='operationalStatistics_panelTitle'))
+        required_data = [self.clear_extra_symbols(document.get_text(block))
+                         for block in statistics_data]
         deliveries_amount_per_hour, deliveries_percent = required_data[0].split('\n')
         couriers_total_amount, couriers_in_queue_amount = required_data[3].split('/')
         return models.DeliveryStatistics(
@@ -131,10 +377,11 @@ class DeliveryStatisticsHTMLParser(HTMLParser):
 
 
 class IngredientStopSalesHTMLParser(HTMLParser):
+    backend = LXML_BACKEND
+    targets = (Target('tbody'),)
 
-    def parse(self) -> list[models.IngredientStopSaleReport]:
-        trs = self._soup.find('tbody').find_all('tr')
-        nested_trs = [[td.text.strip() for td in tr.find_all('td')] for tr in trs]
+    def parse_document(self, document: Document) -> list[models.IngredientStopSaleReport]:
+        nested_trs = document.get_rows(document.find(Target('tbody')))
         return [models.IngredientStopSaleReport(
             department=tds[0],
             ingredient=tds[1],
@@ -146,20 +393,24 @@ class IngredientStopSalesHTMLParser(HTMLParser):
 
 
 class KitchenStatisticsHTMLParser(HTMLParser):
-    __slots__ = ('_soup',)
+    backend = LXML_BACKEND
+    targets = (
+        Target('h1', class_='operationalStatistics_panelTitle'),
+        Target('h1', class_='operationalStatistics_productsCountValue'),
+    )
 
-    def parse(self) -> models.KitchenStatistics:
+    def parse_document(self, document: Document) -> models.KitchenStatistics:
         panel_titles = [
-            self.clear_extra_symbols(i.text)
-            for i in self._soup.find_all('h1', class_='operationalStatistics_panelTitle')
+            self.clear_extra_symbols(document.get_text(i))
+            for i in document.find_all(Target('h1', class_='operationalStatistics_panelTitle'))
         ]
         average_cooking_time = panel_titles[3]
         revenue_per_hour, revenue_increase_over_week_ago = panel_titles[0].split('\n')
         spending_per_hour, spending_increase_over_week_ago = panel_titles[1].split('\n')
 
         postponed, in_queue, in_work = [
-            int(i.text) for i in
-            self._soup.find_all('h1', class_='operationalStatistics_productsCountValue')
+            int(document.get_text(i)) for i in
+            document.find_all(Target('h1', class_='operationalStatistics_productsCountValue'))
         ]
         return models.KitchenStatistics(
             revenue_per_hour=revenue_per_hour,
@@ -174,9 +425,12 @@ class KitchenStatisticsHTMLParser(HTMLParser):
 
 
 class PizzeriaStopSalesHTMLParser(HTMLParser):
-    def parse(self) -> list[models.PizzeriaStopSaleReport]:
-        trs = self._soup.find('table', id='bootgrid-table').find('tbody').find_all('tr')
-        nested_trs = [[td.text.strip() for td in tr.find_all('td')] for tr in trs]
+    backend = LXML_BACKEND
+    targets = (Target('table', id='bootgrid-table'),)
+
+    def parse_document(self, document: Document) -> list[models.PizzeriaStopSaleReport]:
+        table = document.find(Target('table', id='bootgrid-table'))
+        nested_trs = document.get_rows(document.find(Target('tbody'), table))
         return [models.PizzeriaStopSaleReport(
             department=tds[0],
             sale_type=tds[1],
@@ -190,19 +444,24 @@ class PizzeriaStopSalesHTMLParser(HTMLParser):
 
 
 class DepartmentsListHTMLParser(HTMLParser):
-
-    def parse(self) -> list[models.Department]:
-        sale_points_select_picker = self._soup.find('select', id='unitId')
-        sale_point_options = sale_points_select_picker.find_all('option')
-        return [models.Department(unit_id=option.get('value').strip(),
-                                  name=option.text.strip())
+    backend = LXML_BACKEND
+    targets = (Target('select', id='unitId'),)
+
+    def parse_document(self, document: Document) -> list[models.Department]:
+        sale_points_select_picker = document.find(Target('select', id='unitId'))
+        sale_point_options = document.find_all(Target('option'), sale_points_select_picker)
+        return [models.Department(unit_id=document.get_attribute(option, 'value').strip(),
+                                  name=document.get_text(option).strip())
                 for option in sale_point_options]
 
 
 class SectorStopSalesHTMLParser(HTMLParser):
-    def parse(self) -> list[models.SectorStopSaleReport]:
-        trs = self._soup.find('table', id='bootgrid-table').find('tbody').find_all('tr')
-        nested_trs = [[td.text.strip() for td in tr.find_all('td')] for tr in trs]
+    backend = LXML_BACKEND
+    targets = (Target('table', id='bootgrid-table'),)
+
+    def parse_document(self, document: Document) -> list[models.SectorStopSaleReport]:
+        table = document.find(Target('table', id='bootgrid-table'))
+        nested_trs = document.get_rows(document.find(Target('tbody'), table))
         return [models.SectorStopSaleReport(
             department=tds[0],
             sector=tds[1],
@@ -213,9 +472,11 @@ class SectorStopSalesHTMLParser(HTMLParser):
 
 
 class StreetStopSalesHTMLParser(HTMLParser):
-    def parse(self) -> list[models.StreetStopSaleReport]:
-        trs = self._soup.find('table', id='bootgrid-table').find_all('tr')[1:]
-        nested_trs = [[td.text.strip() for td in tr.find_all('td')] for tr in trs]
+    backend = LXML_BACKEND
+    targets = (Target('table', id='bootgrid-table'),)
+
+    def parse_document(self, document: Document) -> list[models.StreetStopSaleReport]:
+        nested_trs = document.get_rows(document.find(Target('table', id='bootgrid-table')))[1:]
         return [models.StreetStopSaleReport(
             department=tds[0],
             sector=tds[1],
@@ -227,12 +488,12 @@ class StreetStopSalesHTMLParser(HTMLParser):
 
 
 class RestaurantOrdersParser(HTMLParser):
+    backend = LXML_BACKEND
+    targets = (Target('tbody'),)
 
-    def parse(self) -> list[models.Order]:
-        tbody = self._soup.find('tbody')
+    def parse_document(self, document: Document) -> list[models.Order]:
         result = []
-        for tr in tbody.find_all('tr'):
-            tds = [td.text.strip() for td in tr.find_all('td')]
+        for tds in document.get_rows(document.find(Target('tbody'))):
             result.append(models.Order(
                 department=tds[0],
                 datetime=tds[1],
@@ -13,6 +13,8 @@ __all__ = (
     'PizzeriaStopSalesRequest',
     'IngredientStopSalesRequest',
     'CanceledOrderByUUIDRequest',
+    'RestaurantOrdersRequest',
+    'RevenueStatisticsRequest',
 )
 
 
@@ -35,6 +37,8 @@ class GETRequestMixin:
 class DodoAPIRequest:
     request_method: str
     url: str
+    # Small idempotent request that may be sent twice if the first one is slow.
+    is_hedgeable: bool = False
 
     def get_request_params(self) -> dict:
         """
@@ -130,8 +134,43 @@ class DepartmentsListRequest(DodoAPIRequest, GETRequestMixin):
     url = 'https://officemanager.dodopizza.ru/OfficeManager/OperationalStatistics'
 
 
+class RestaurantOrdersRequest(DodoAPIRequest, POSTRequestMixin):
+    __slots__ = ('__date', '__department_ids')
+
+    url = 'https://officemanager.dodopizza.ru/Reports/Orders/Get'
+
+    def __init__(self, department_ids: Iterable[int], date: str):
+        self.__date = date
+        self.__department_ids = tuple(department_ids)
+
+    def get_data(self) -> dict:
+        return {
+            'filterType': 'OrdersFromRestaurant',
+            'unitsIds': self.__department_ids,
+            'OrderSources': 'Restaurant',
+            'beginDate': self.__date,
+            'endDate': self.__date,
+            'orderTypes': ['Delivery', 'Pickup', 'Stationary'],
+        }
+
+
+class RevenueStatisticsRequest(DodoAPIRequest, GETRequestMixin):
+    __slots__ = ('_department_id', '_lang')
+    is_hedgeable = True
+
+    def __init__(self, department_id: int, lang: str = 'ru'):
+        self._department_id = department_id
+        self._lang = lang
+
+    @property
+    def url(self) -> str:
+        return (f'https://publicapi.dodois.io/{self._lang}/api/v1'
+                f'/OperationalStatisticsForTodayAndWeekBefore/{self._department_id}')
+
+
 class StatisticsRequest(DodoAPIRequest, GETRequestMixin):
     __slots__ = ('_department_id',)
+    is_hedgeable = True
 
     def __init__(self, department_id: int):
         self._department_id = department_id
@@ -0,0 +1,126 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Optional
+
+from .utils import exceptions
+
+__all__ = (
+    'RetryPolicy',
+    'CircuitBreaker',
+    'CircuitBreakerRegistry',
+    'default_retry_policy',
+    'circuit_breakers',
+)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter.
+
+    Attributes:
+        max_retries: Max amount of retries after first attempt.
+        base_delay: Delay before first retry in seconds (before jitter).
+        max_delay: Max delay between retries in seconds, also caps "Retry-After".
+        retryable_status_codes: Status codes of responses that should be retried.
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 30,
+                 retryable_status_codes: Iterable[int] = (429, 500, 502, 503, 504)):
+        self.max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._retryable_status_codes = frozenset(retryable_status_codes)
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        return status_code in self._retryable_status_codes
+
+    def get_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Get delay before retry.
+
+        Args:
+            attempt: Number of failed attempt, starts from 0.
+            retry_after: Delay requested by server in "Retry-After" header.
+
+        Returns:
+            Delay in seconds.
+        """
+        if retry_after is not None:
+            return min(retry_after, self._max_delay)
+        return random.uniform(0, min(self._max_delay, self._base_delay * 2 ** attempt))
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Parse "Retry-After" header that contains either seconds or HTTP date."""
+        if not value:
+            return None
+        if value.isdigit():
+            return float(value)
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, retry_at.timestamp() - time.time())
+
+
+class CircuitBreaker:
+    """Stops requests to endpoint after several failures in a row.
+
+    When breaker is open, requests are rejected until recovery timeout passes.
+    After that single request is let through to probe the endpoint (half-open state):
+    breaker is closed on its success and opened again on its failure.
+
+    Attributes:
+        failure_threshold: Amount of failures in a row that opens breaker.
+        recovery_timeout: Seconds before probing of failing endpoint.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30):
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def is_closed(self) -> bool:
+        return self._opened_at is None
+
+    def before_request(self, url: str = ''):
+        """Check whether request is allowed.
+
+        Raises:
+            CircuitBreakerOpenError: If breaker is open.
+        """
+        if self._opened_at is None:
+            return
+        now = time.monotonic()
+        if now - self._opened_at < self._recovery_timeout:
+            raise exceptions.CircuitBreakerOpenError(url)
+        # This request probes endpoint, others are rejected until its result.
+        self._opened_at = now
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self._failures >= self._failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+class CircuitBreakerRegistry:
+    """Circuit breakers by endpoint URL."""
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30):
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, url: str) -> CircuitBreaker:
+        if url not in self._breakers:
+            self._breakers[url] = CircuitBreaker(self._failure_threshold, self._recovery_timeout)
+        return self._breakers[url]
+
+
+default_retry_policy = RetryPolicy()
+circuit_breakers = CircuitBreakerRegistry()
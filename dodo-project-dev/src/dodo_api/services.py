@@ -1,10 +1,15 @@
+import time
+import typing
 from abc import ABC, abstractmethod
-from typing import Union, Iterable
+from typing import Any, AsyncIterator, Callable, Union, Iterable, NamedTuple, Optional
 
-import httpx
+import pendulum
 
-from . import parsers, requests, executor, models
-from .utils import file_utils
+from . import cache, parsers, requests, executor, models, workers
+from .fingerprints import get_fingerprint, response_fingerprints
+from .instrumentation import instrumentation
+from .limits import BACKGROUND_PRIORITY
+from .utils import time_utils
 
 __all__ = (
     'DepartmentsList',
@@ -12,6 +17,7 @@ __all__ = (
     'CanceledOrders',
     'CanceledOrderByUUID',
     'RevenueStatistics',
+    'RestaurantOrders',
     'DetailedDeliveryStatistics',
     'KitchenStatistics',
     'DeliveryStatistics',
@@ -19,18 +25,92 @@ __all__ = (
     'StreetStopSales',
     'PizzeriaStopSales',
     'IngredientStopSales',
+    'ServiceResult',
+    'get_batch_data',
 )
 
 
 class Service(ABC):
     parser: Union[parsers.html.HTMLParser, parsers.excel.ExcelParser]
     request: requests.DodoAPIRequest
+    # Seconds while parsed result is fresh, None disables caching.
+    cache_ttl: Optional[float] = None
+    # Seconds after cache_ttl while stale result is returned and refreshed in background.
+    cache_stale_ttl: float = 0
 
-    def __init__(self, cookies: dict):
+    def __init__(self, cookies: dict, account_name: Optional[str] = None,
+                 priority: int = BACKGROUND_PRIORITY, use_cache: bool = True):
         self._cookies = cookies
+        self._account_name = account_name
+        self._priority = priority
+        # Pollers that need the current state, e.g. of stop sales, don't read the cache,
+        # but their fresh results are stored in it for other callers, e.g. the bot.
+        self._use_cache = use_cache
 
     async def run_request(self, request: requests.DodoAPIRequest) -> executor.DodoAPIResponse:
-        return await executor.run_request(self._cookies, request)
+        return await executor.run_request(self._cookies, request, account_name=self._account_name,
+                                          priority=self._priority)
+
+    async def get_parsed_response(self, request: requests.DodoAPIRequest):
+        """Run request and parse response.
+
+        Concurrent identical calls of the same service share one request and its parsed result.
+        Result is cached if service has cache TTL. Service that doesn't use cache
+        always runs request, and stores its result in cache.
+        """
+        key = self.get_request_key(request)
+
+        def fetch():
+            return executor.coalescer.run(key, lambda: self._run_and_parse(request))
+
+        cache_ttl = self.get_cache_ttl()
+        if cache_ttl is None:
+            return await fetch()
+        if not self._use_cache:
+            data = await fetch()
+            await self.store_result(request, data)
+            return data
+        return await cache.get_or_fetch(key, fetch, cache_ttl, self.cache_stale_ttl,
+                                        self.get_result_type())
+
+    async def store_result(self, request: requests.DodoAPIRequest, data: Any):
+        """Store result fetched past cache, if service has cache TTL."""
+        cache_ttl = self.get_cache_ttl()
+        if cache_ttl is not None:
+            await cache.store(self.get_request_key(request), data, cache_ttl, self.cache_stale_ttl)
+
+    def get_request_key(self, request: requests.DodoAPIRequest) -> tuple:
+        return (type(self).__qualname__,
+                *executor.get_request_key(request, self._account_name, self._cookies))
+
+    def get_cache_ttl(self) -> Optional[float]:
+        return self.cache_ttl
+
+    def get_result_type(self) -> Any:
+        """Get type of parsed result from return annotation of get_data."""
+        return typing.get_type_hints(type(self).get_data).get('return', Any)
+
+    async def _run_and_parse(self, request: requests.DodoAPIRequest):
+        response = await self.run_request(request)
+        return await self.parse(response)
+
+    def get_batch_request(self) -> executor.BatchRequest:
+        return executor.BatchRequest(cookies=self._cookies, request=self.get_prepared_request(),
+                                     account_name=self._account_name, priority=self._priority)
+
+    async def parse(self, response: executor.DodoAPIResponse):
+        """Parse response in pool of parsing and report duration of parsing."""
+        data, elapsed = await workers.run_parsing(_measure_parsing, self.parse_response, response)
+        instrumentation.on_parse_done(type(self).__name__, elapsed)
+        return data
+
+    def parse_response(self, response: executor.DodoAPIResponse):
+        """Parse response into models.
+
+        It's run in pool of parsing, so it must not touch event loop,
+        and service with response must be picklable for process pool.
+        """
+        return self.parser(response.content, encoding=response.encoding).parse()
 
     @abstractmethod
     async def get_data(self):
@@ -41,13 +121,73 @@ class Service(ABC):
         pass
 
 
+def _measure_parsing(parse: Callable[..., Any], *args) -> tuple[Any, float]:
+    started_at = time.perf_counter()
+    data = parse(*args)
+    return data, time.perf_counter() - started_at
+
+
+class ServiceResult(NamedTuple):
+    service: Service
+    data: Any
+    error: Optional[Exception]
+    # Response is the same as the last handled one, so it isn't parsed and data is None.
+    unchanged: bool = False
+
+
+async def get_batch_data(services: Iterable[Service],
+                         skip_unchanged: bool = False) -> AsyncIterator[ServiceResult]:
+    """Get data of many services concurrently within request limits of executor.
+
+    Args:
+        services: Services with single request (not paginated).
+        skip_unchanged: Don't parse response that is byte-identical to the last
+            handled response of the same request, yield "unchanged" result instead.
+            Response is considered handled when the caller asks for the next result,
+            so data isn't lost if the caller fails on it.
+
+    Yields:
+        Parsed data of services in order of completion. Failed service
+        doesn't stop the batch, its result contains error instead of data.
+        Batch doesn't read the cache, but parsed data of services with cache TTL
+        is stored in it.
+    """
+    services_by_request = {}
+    batch_requests = []
+    for service in services:
+        batch_request = service.get_batch_request()
+        services_by_request[batch_request.request] = service
+        batch_requests.append(batch_request)
+    async for result in executor.run_batch(batch_requests):
+        service = services_by_request[result.request]
+        if result.error is not None:
+            yield ServiceResult(service=service, data=None, error=result.error)
+            continue
+        fingerprint = fingerprint_key = None
+        if skip_unchanged:
+            fingerprint_key = service.get_request_key(result.request)
+            fingerprint = get_fingerprint(result.response.content)
+            if response_fingerprints.get(fingerprint_key) == fingerprint:
+                yield ServiceResult(service=service, data=None, error=None, unchanged=True)
+                continue
+        try:
+            data = await service.parse(result.response)
+        except Exception as error:
+            yield ServiceResult(service=service, data=None, error=error)
+            continue
+        await service.store_result(result.request, data)
+        yield ServiceResult(service=service, data=data, error=None)
+        if fingerprint is not None:
+            response_fingerprints.remember(fingerprint_key, fingerprint)
+
+
 class DepartmentsList(Service):
     parser = parsers.html.DepartmentsListHTMLParser
     request = requests.DepartmentsListRequest
+    cache_ttl = 60 * 60
 
     async def get_data(self) -> list[models.Department]:
-        response = await self.run_request(self.get_prepared_request())
-        return self.parser(response.html).parse()
+        return await self.get_parsed_response(self.get_prepared_request())
 
     def get_prepared_request(self) -> requests.DepartmentsListRequest:
         return self.request()
@@ -56,28 +196,36 @@ class DepartmentsList(Service):
 class BeingLateCertificates(Service):
     parser = parsers.html.BeingLateCertificatesTableParser
     request = requests.BeingLateCertificatesRequest
+    cache_ttl = 60
+    cache_stale_ttl = 60
 
     def __init__(self, cookies: dict, department_ids: Iterable[int],
-                 begin_date: str, end_date: str):
-        super().__init__(cookies)
+                 begin_date: str, end_date: str, **kwargs):
+        super().__init__(cookies, **kwargs)
         self._department_ids = department_ids
         self._begin_date = begin_date
         self._end_date = end_date
 
     async def get_data(self) -> list[models.BeingLateCertificate]:
-        response = await executor.run_request(self._cookies, self.get_prepared_request())
-        return self.parser(response.html).parse()
+        return await self.get_parsed_response(self.get_prepared_request())
 
     def get_prepared_request(self) -> requests.BeingLateCertificatesRequest:
         return self.request(self._department_ids, self._begin_date, self._end_date)
 
+    def get_cache_ttl(self) -> Optional[float]:
+        end_date = pendulum.from_format(self._end_date, 'DD.MM.YYYY', time_utils.MOSCOW_UTC).date()
+        if end_date < time_utils.get_today_date():
+            # Certificates of past days don't change.
+            return 24 * 60 * 60
+        return self.cache_ttl
+
 
 class CanceledOrders(Service):
     parser = parsers.html.CanceledOrderUUIDsParser
     request = requests.CanceledOrdersRequest
 
-    def __init__(self, cookies: dict, date: str):
-        super().__init__(cookies)
+    def __init__(self, cookies: dict, date: str, **kwargs):
+        super().__init__(cookies, **kwargs)
         self._date = date
 
     async def get_data(self):
@@ -85,7 +233,7 @@ class CanceledOrders(Service):
         result = []
         while True:
             response = await self.run_request(request)
-            orders = self.parser(response.html).parse()
+            orders = await self.parse(response)
             if not orders:
                 return result
             result += orders
@@ -99,16 +247,19 @@ class CanceledOrderByUUID(Service):
     parser = parsers.html.CanceledOrderByUUIDHTMLParser
     request = requests.CanceledOrderByUUIDRequest
 
-    def __init__(self, cookies: dict, order_uuid: str, order_price: str, order_type: str):
-        super().__init__(cookies)
+    def __init__(self, cookies: dict, order_uuid: str, order_price: str, order_type: str,
+                 **kwargs):
+        super().__init__(cookies, **kwargs)
         self._order_uuid = order_uuid
         self._order_price = order_price
         self._order_type = order_type
 
     async def get_data(self) -> models.CanceledOrderReport:
-        response = await self.run_request(self.get_prepared_request())
-        return self.parser(response.html, self._order_uuid,
-                           self._order_price, self._order_type).parse()
+        return await self.get_parsed_response(self.get_prepared_request())
+
+    def parse_response(self, response: executor.DodoAPIResponse) -> models.CanceledOrderReport:
+        return self.parser(response.content, self._order_uuid, self._order_price,
+                           self._order_type, encoding=response.encoding).parse()
 
     def get_prepared_request(self) -> requests.CanceledOrderByUUIDRequest:
         return self.request(self._order_uuid)
@@ -119,19 +270,18 @@ class DetailedDeliveryStatistics(Service):
     request = requests.DetailedDeliveryStatisticsRequest
 
     def __init__(self, cookies: dict, department_ids: Iterable[int],
-                 begin_date: str, end_date: str):
-        super().__init__(cookies)
+                 begin_date: str, end_date: str, **kwargs):
+        super().__init__(cookies, **kwargs)
         self._department_ids = department_ids
         self._begin_date = begin_date
         self._end_date = end_date
 
     async def get_data(self) -> list[models.DeliveryStatisticsRow]:
-        response = await self.run_request(self.get_prepared_request())
-        with file_utils.TempFileProxy('xlsx') as tmp_file_proxy:
-            with open(tmp_file_proxy.file_path, 'wb') as report_file:
-                report_file.write(response.content)
-            with self.parser(tmp_file_proxy.file_path) as parser:
-                return parser.get_data()
+        return await self.get_parsed_response(self.get_prepared_request())
+
+    def parse_response(self, response: executor.DodoAPIResponse) -> list[models.DeliveryStatisticsRow]:
+        with self.parser(response.content) as parser:
+            return parser.get_data()
 
     def get_prepared_request(self) -> requests.DodoAPIRequest:
         return self.request(self._department_ids, self._begin_date, self._end_date)
@@ -140,14 +290,15 @@ class DetailedDeliveryStatistics(Service):
 class KitchenStatistics(Service):
     parser = parsers.html.KitchenStatisticsHTMLParser
     request = requests.KitchenStatisticsRequest
+    cache_ttl = 30
+    cache_stale_ttl = 30
 
-    def __init__(self, cookies: dict, department_id: int):
-        super().__init__(cookies)
+    def __init__(self, cookies: dict, department_id: int, **kwargs):
+        super().__init__(cookies, **kwargs)
         self._department_id = department_id
 
     async def get_data(self) -> models.KitchenStatistics:
-        response = await self.run_request(self.get_prepared_request())
-        return self.parser(response.html).parse()
+        return await self.get_parsed_response(self.get_prepared_request())
 
     def get_prepared_request(self) -> requests.DodoAPIRequest:
         return self.request(self._department_id)
@@ -156,48 +307,71 @@ class KitchenStatistics(Service):
 class DeliveryStatistics(Service):
     parser = parsers.html.DeliveryStatisticsHTMLParser
     request = requests.DeliveryStatisticsRequest
+    cache_ttl = 30
+    cache_stale_ttl = 30
 
-    def __init__(self, cookies: dict, department_id: int):
-        super().__init__(cookies)
+    def __init__(self, cookies: dict, department_id: int, **kwargs):
+        super().__init__(cookies, **kwargs)
         self._department_id = department_id
 
     async def get_data(self) -> models.DeliveryStatistics:
-        response = await self.run_request(self.get_prepared_request())
-        return self.parser(response.html).parse()
+        return await self.get_parsed_response(self.get_prepared_request())
 
     def get_prepared_request(self) -> requests.DodoAPIRequest:
         return self.request(self._department_id)
 
 
-class RevenueStatistics:
+class RevenueStatistics(Service):
+    request = requests.RevenueStatisticsRequest
 
-    def __init__(self, department_id: int, lang: str = 'ru'):
+    def __init__(self, department_id: int, lang: str = 'ru', **kwargs):
+        # Public API doesn't need cookies of account.
+        super().__init__({}, **kwargs)
         self._department_id = department_id
         self._lang = lang
 
     async def get_data(self) -> models.OperationalStatisticsForTodayAndWeekBefore:
-        url = (f'https://publicapi.dodois.io/{self._lang}/api/v1'
-               f'/OperationalStatisticsForTodayAndWeekBefore/{self._department_id}')
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            response_json = response.json()
-            return models.OperationalStatisticsForTodayAndWeekBefore.parse_obj(response_json)
+        return await self.get_parsed_response(self.get_prepared_request())
+
+    def parse_response(self, response: executor.DodoAPIResponse) -> models.OperationalStatisticsForTodayAndWeekBefore:
+        return models.OperationalStatisticsForTodayAndWeekBefore.parse_raw(
+            response.content, encoding=response.encoding)
+
+    def get_prepared_request(self) -> requests.RevenueStatisticsRequest:
+        return self.request(self._department_id, self._lang)
+
+
+class RestaurantOrders(Service):
+    parser = parsers.html.RestaurantOrdersParser
+    request = requests.RestaurantOrdersRequest
+
+    def __init__(self, cookies: dict, department_ids: Iterable[int], date: str, **kwargs):
+        super().__init__(cookies, **kwargs)
+        self._department_ids = department_ids
+        self._date = date
+
+    async def get_data(self) -> list[models.Order]:
+        return await self.get_parsed_response(self.get_prepared_request())
+
+    def get_prepared_request(self) -> requests.RestaurantOrdersRequest:
+        return self.request(self._department_ids, self._date)
 
 
 class PizzeriaStopSales(Service):
     parser = parsers.html.PizzeriaStopSalesHTMLParser
     request = requests.PizzeriaStopSalesRequest
+    cache_ttl = 60
+    cache_stale_ttl = 60
 
     def __init__(self, cookies: dict, department_ids: Iterable[int],
-                 begin_date: str, end_date: str):
-        super().__init__(cookies)
+                 begin_date: str, end_date: str, **kwargs):
+        super().__init__(cookies, **kwargs)
         self._department_ids = department_ids
         self._begin_date = begin_date
         self._end_date = end_date
 
     async def get_data(self) -> list[models.PizzeriaStopSaleReport]:
-        response = await self.run_request(self.get_prepared_request())
-        return self.parser(response.html).parse()
+        return await self.get_parsed_response(self.get_prepared_request())
 
     def get_prepared_request(self) -> requests.DodoAPIRequest:
         return self.request(self._department_ids, self._begin_date, self._end_date)
@@ -206,17 +380,18 @@ class PizzeriaStopSales(Service):
 class IngredientStopSales(Service):
     parser = parsers.html.IngredientStopSalesHTMLParser
     request = requests.IngredientStopSalesRequest
+    cache_ttl = 60
+    cache_stale_ttl = 60
 
     def __init__(self, cookies: dict, department_ids: Iterable[int],
-                 begin_date: str, end_date: str):
-        super().__init__(cookies)
+                 begin_date: str, end_date: str, **kwargs):
+        super().__init__(cookies, **kwargs)
         self._department_ids = department_ids
         self._begin_date = begin_date
         self._end_date = end_date
 
     async def get_data(self) -> list[models.IngredientStopSaleReport]:
-        response = await self.run_request(self.get_prepared_request())
-        return self.parser(response.html).parse()
+        return await self.get_parsed_response(self.get_prepared_request())
 
     def get_prepared_request(self) -> requests.IngredientStopSalesRequest:
         return self.request(self._department_ids, self._begin_date, self._end_date)
@@ -225,17 +400,18 @@ class IngredientStopSales(Service):
 class SectorStopSales(Service):
     parser = parsers.html.SectorStopSalesHTMLParser
     request = requests.SectorStopSalesRequest
+    cache_ttl = 60
+    cache_stale_ttl = 60
 
     def __init__(self, cookies: dict, department_ids: Iterable[int],
-                 begin_date: str, end_date: str):
-        super().__init__(cookies)
+                 begin_date: str, end_date: str, **kwargs):
+        super().__init__(cookies, **kwargs)
         self._department_ids = department_ids
         self._begin_date = begin_date
         self._end_date = end_date
 
     async def get_data(self) -> list[models.SectorStopSaleReport]:
-        response = await self.run_request(self.get_prepared_request())
-        return self.parser(response.html).parse()
+        return await self.get_parsed_response(self.get_prepared_request())
 
     def get_prepared_request(self) -> requests.SectorStopSalesRequest:
         return self.request(self._department_ids, self._begin_date, self._end_date)
@@ -244,33 +420,18 @@ class SectorStopSales(Service):
 class StreetStopSales(Service):
     parser = parsers.html.StreetStopSalesHTMLParser
     request = requests.StreetStopSalesRequest
+    cache_ttl = 60
+    cache_stale_ttl = 60
 
     def __init__(self, cookies: dict, department_ids: Iterable[int],
-                 begin_date: str, end_date: str):
-        super().__init__(cookies)
+                 begin_date: str, end_date: str, **kwargs):
+        super().__init__(cookies, **kwargs)
         self._department_ids = department_ids
         self._begin_date = begin_date
         self._end_date = end_date
 
     async def get_data(self) -> list[models.StreetStopSaleReport]:
-        response = await self.run_request(self.get_prepared_request())
-        return self.parser(response.html).parse()
+        return await self.get_parsed_response(self.get_prepared_request())
 
     def get_prepared_request(self) -> requests.StreetStopSalesRequest:
         return self.request(self._department_ids, self._begin_date, self._end_date)
-
-
-async def get_restaurant_orders(cookies: dict, unit_ids: Iterable[int | str], date: str) -> list[models.Order]:
-    url = 'https://officemanager.dodopizza.ru/Reports/Orders/Get'
-    async with httpx.AsyncClient(cookies=cookies) as client:
-        response = await client.post(url, timeout=30, data={
-            'filterType': 'OrdersFromRestaurant',
-            'unitsIds': unit_ids,
-            'OrderSources': 'Restaurant',
-            'beginDate': date,
-            'endDate': date,
-            'orderTypes': ['Delivery', 'Pickup', 'Stationary']
-        })
-        with open('response.html', 'w') as file:
-            file.write(response.text)
-        return parsers.html.RestaurantOrdersParser(response.text).parse()
@@ -0,0 +1,88 @@
+import asyncio
+from typing import Callable, Optional
+
+import httpx
+
+__all__ = (
+    'SessionManager',
+    'session_manager',
+)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Goretsky-Band',
+}
+
+# Loader polls every minute, so keep-alive connections must live longer than that.
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=20,
+    max_keepalive_connections=10,
+    keepalive_expiry=90,
+)
+
+
+class SessionManager:
+    """Keeps one long-lived HTTP client per Dodo IS account.
+
+    Requests of the same account reuse warm keep-alive connections
+    instead of doing new TCP+TLS handshake every time.
+    Clients must be closed by "close_all" on shutdown.
+
+    Attributes:
+        limits: Connection pool limits of every client.
+        transport_factory: Function that creates transport of every client,
+            e.g. recording or replaying one. Real HTTP transport is used if it isn't passed.
+    """
+
+    def __init__(self, limits: httpx.Limits = DEFAULT_LIMITS,
+                 transport_factory: Optional[Callable[[], httpx.AsyncBaseTransport]] = None):
+        self._limits = limits
+        self._transport_factory = transport_factory
+        self._clients: dict[Optional[str], httpx.AsyncClient] = {}
+        self._clients_cookies: dict[Optional[str], dict] = {}
+
+    @staticmethod
+    def get_session_key(account_name: Optional[str], cookies: Optional[dict]) -> Optional[str]:
+        if account_name is not None:
+            return account_name
+        if not cookies:
+            return None
+        return 'cookies:' + ';'.join(f'{name}={value}' for name, value in sorted(cookies.items()))
+
+    def get_client(self, account_name: Optional[str] = None,
+                   cookies: Optional[dict] = None) -> httpx.AsyncClient:
+        """Get shared client of account.
+
+        Args:
+            account_name: Name of account. Client without account is shared by
+                all requests without cookies (e.g. public API).
+            cookies: Actual cookies of account. Client's cookies are replaced
+                if they've been renewed since the last call.
+
+        Returns:
+            HTTP client with keep-alive connection pool.
+        """
+        session_key = self.get_session_key(account_name, cookies)
+        client = self._clients.get(session_key)
+        if client is None:
+            transport = self._transport_factory() if self._transport_factory is not None else None
+            client = httpx.AsyncClient(headers=DEFAULT_HEADERS, limits=self._limits,
+                                       transport=transport)
+            self._clients[session_key] = client
+        if cookies and self._clients_cookies.get(session_key) != cookies:
+            client.cookies = cookies
+            self._clients_cookies[session_key] = dict(cookies)
+        return client
+
+    def set_transport_factory(
+            self, transport_factory: Optional[Callable[[], httpx.AsyncBaseTransport]]):
+        """Replace factory of transports. Affects only clients created after the call."""
+        self._transport_factory = transport_factory
+
+    async def close_all(self):
+        clients = list(self._clients.values())
+        self._clients.clear()
+        self._clients_cookies.clear()
+        await asyncio.gather(*(client.aclose() for client in clients))
+
+
+session_manager = SessionManager()
@@ -0,0 +1,102 @@
+import collections
+import math
+from typing import Optional
+
+from . import requests
+from .instrumentation import Instrument, instrumentation
+
+__all__ = (
+    'LatencyTracker',
+    'AdaptiveTimeoutPolicy',
+    'latency_tracker',
+    'default_timeout_policy',
+)
+
+
+class LatencyTracker(Instrument):
+    """Keeps latencies of the recent successful responses of every endpoint.
+    Timed out request is kept as latency equal to its timeout, so timeout
+    of endpoint that is slower than it can grow.
+
+    Attributes:
+        window: Amount of the recent latencies kept per endpoint.
+    """
+
+    def __init__(self, window: int = 200):
+        self._window = window
+        self._latencies: dict[str, collections.deque[float]] = {}
+
+    @staticmethod
+    def get_endpoint(request: requests.DodoAPIRequest) -> str:
+        return type(request).__name__
+
+    def on_response(self, request, status_code, elapsed, size):
+        if status_code < 500:
+            self._add_latency(request, elapsed)
+
+    def on_timeout(self, request, timeout):
+        self._add_latency(request, timeout)
+
+    def _add_latency(self, request: requests.DodoAPIRequest, latency: float):
+        endpoint = self.get_endpoint(request)
+        if endpoint not in self._latencies:
+            self._latencies[endpoint] = collections.deque(maxlen=self._window)
+        self._latencies[endpoint].append(latency)
+
+    def get_percentile(self, request: requests.DodoAPIRequest, percentile: float,
+                       min_samples: int = 1) -> Optional[float]:
+        """Get percentile (from 0 to 100) of latency of request's endpoint,
+        or None if there are less than min_samples latencies.
+        """
+        latencies = self._latencies.get(self.get_endpoint(request), ())
+        if not latencies or len(latencies) < min_samples:
+            return None
+        sorted_latencies = sorted(latencies)
+        return sorted_latencies[max(math.ceil(percentile / 100 * len(sorted_latencies)) - 1, 0)]
+
+
+class AdaptiveTimeoutPolicy:
+    """Timeouts and hedging delays learned from latencies of endpoints.
+
+    Attributes:
+        tracker: Tracker of latencies.
+        default_timeout: Timeout while there are not enough latencies of endpoint.
+        timeout_percentile: Percentile of latency that timeout is based on.
+        timeout_multiplier: Timeout is percentile of latency multiplied by it.
+        min_timeout: Min timeout in seconds.
+        max_timeout: Max timeout in seconds.
+        hedging: Send second copy of hedgeable request if the first one is slow.
+        hedging_percentile: Percentile of latency after which second copy is sent.
+        min_samples: Min amount of latencies to learn from.
+    """
+
+    def __init__(self, tracker: LatencyTracker, default_timeout: float = 5,
+                 timeout_percentile: float = 99, timeout_multiplier: float = 3,
+                 min_timeout: float = 2, max_timeout: float = 60,
+                 hedging: bool = True, hedging_percentile: float = 95, min_samples: int = 20):
+        self.tracker = tracker
+        self.default_timeout = default_timeout
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.hedging = hedging
+        self.hedging_percentile = hedging_percentile
+        self.min_samples = min_samples
+
+    def get_timeout(self, request: requests.DodoAPIRequest) -> float:
+        latency = self.tracker.get_percentile(request, self.timeout_percentile, self.min_samples)
+        if latency is None:
+            return self.default_timeout
+        return min(max(latency * self.timeout_multiplier, self.min_timeout), self.max_timeout)
+
+    def get_hedging_delay(self, request: requests.DodoAPIRequest) -> Optional[float]:
+        """Get seconds after which second copy of request is sent, or None if it isn't hedged."""
+        if not self.hedging or not request.is_hedgeable:
+            return None
+        return self.tracker.get_percentile(request, self.hedging_percentile, self.min_samples)
+
+
+latency_tracker = LatencyTracker()
+instrumentation.add(latency_tracker)
+default_timeout_policy = AdaptiveTimeoutPolicy(latency_tracker)
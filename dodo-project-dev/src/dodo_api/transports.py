@@ -0,0 +1,180 @@
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import pathlib
+import random
+import time
+from typing import Callable, Optional, Union
+
+import httpx
+
+from .sessions import DEFAULT_LIMITS, session_manager
+from .utils import exceptions
+
+__all__ = (
+    'ResponseArchive',
+    'RecordingTransport',
+    'ReplayTransport',
+    'configure_transport',
+)
+
+RawURL = tuple[bytes, bytes, Optional[int], bytes]
+RawHeaders = list[tuple[bytes, bytes]]
+
+# Response headers that aren't written to archive, so it doesn't keep sessions of accounts.
+EXCLUDED_HEADERS = {b'set-cookie'}
+
+
+class ResponseArchive:
+    """Directory of recorded responses, one gzipped JSON file per response.
+
+    Every response is written to its own file, so archive stays valid if
+    process is killed, and several processes can record to the same archive.
+    Responses are keyed by method, URL and body of request, cookies aren't
+    part of key, so archive is shared by all accounts.
+
+    Attributes:
+        path: Path to directory of archive.
+    """
+
+    def __init__(self, path: Union[str, pathlib.Path]):
+        self._path = pathlib.Path(path)
+        self._replay_positions: dict[str, int] = {}
+
+    @staticmethod
+    def get_key(method: bytes, url: RawURL, body: bytes) -> str:
+        scheme, host, port, target = url
+        key = hashlib.sha1(b'%s %s://%s:%d%s\n' % (method, scheme, host, port or 0, target))
+        key.update(hashlib.sha1(body).digest())
+        return key.hexdigest()
+
+    def get_entry_paths(self, key: str) -> list[pathlib.Path]:
+        return sorted(self._path.glob(f'{key}.*.json.gz'),
+                      key=lambda path: int(path.name.split('.')[1]))
+
+    def record(self, key: str, entry: dict):
+        self._path.mkdir(parents=True, exist_ok=True)
+        content = gzip.compress(json.dumps(entry, ensure_ascii=False).encode())
+        number = len(self.get_entry_paths(key))
+        while True:
+            try:
+                with open(self._path / f'{key}.{number}.json.gz', 'xb') as file:
+                    file.write(content)
+                return
+            except FileExistsError:
+                number += 1
+
+    def replay(self, key: str) -> Optional[dict]:
+        """Get recorded responses of request one by one in order of recording.
+
+        The last response is repeated when recorded ones are over.
+        """
+        paths = self.get_entry_paths(key)
+        if not paths:
+            return None
+        position = self._replay_positions.get(key, 0)
+        self._replay_positions[key] = position + 1
+        with gzip.open(paths[min(position, len(paths) - 1)]) as file:
+            return json.load(file)
+
+
+async def _read_stream(stream: httpx.AsyncByteStream) -> bytes:
+    try:
+        return b''.join([part async for part in stream])
+    finally:
+        await stream.aclose()
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Transport that sends requests by another transport and records responses to archive.
+
+    Attributes:
+        archive: Archive of responses.
+        transport: Transport of real requests, HTTP transport by default.
+    """
+
+    def __init__(self, archive: ResponseArchive,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._archive = archive
+        self._transport = transport or httpx.AsyncHTTPTransport(limits=DEFAULT_LIMITS)
+
+    async def handle_async_request(self, method: bytes, url: RawURL, headers: RawHeaders,
+                                   stream: httpx.AsyncByteStream, extensions: dict):
+        body = await _read_stream(stream)
+        started_at = time.monotonic()
+        status_code, response_headers, response_stream, response_extensions = (
+            await self._transport.handle_async_request(method, url, headers,
+                                                       httpx.ByteStream(body), extensions))
+        content = await _read_stream(response_stream)
+        self._archive.record(ResponseArchive.get_key(method, url, body), {
+            'method': method.decode(),
+            'url': (b'%s://%s%s' % (url[0], url[1], url[3])).decode(),
+            'status_code': status_code,
+            'headers': [(name.decode('latin-1'), value.decode('latin-1'))
+                        for name, value in response_headers
+                        if name.lower() not in EXCLUDED_HEADERS],
+            'content': base64.b64encode(content).decode(),
+            'elapsed': time.monotonic() - started_at,
+        })
+        return status_code, response_headers, httpx.ByteStream(content), response_extensions
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Transport that replays responses from archive without network calls.
+
+    Attributes:
+        archive: Archive of responses.
+        latency_factor: Part of recorded response time to wait before response,
+            0 replays instantly, 1 replays at recorded speed.
+        error_rate: Probability of injected error instead of response:
+            either transport error or response with status 503.
+        seed: Seed of random of injected errors.
+
+    Raises:
+        ReplayMissError: If request isn't recorded.
+    """
+
+    def __init__(self, archive: ResponseArchive, latency_factor: float = 0,
+                 error_rate: float = 0, seed: Optional[int] = None):
+        self._archive = archive
+        self._latency_factor = latency_factor
+        self._error_rate = error_rate
+        self._random = random.Random(seed)
+
+    async def handle_async_request(self, method: bytes, url: RawURL, headers: RawHeaders,
+                                   stream: httpx.AsyncByteStream, extensions: dict):
+        body = await _read_stream(stream)
+        entry = self._archive.replay(ResponseArchive.get_key(method, url, body))
+        if entry is None:
+            raise exceptions.ReplayMissError(
+                (b'%s %s://%s%s' % (method, url[0], url[1], url[3])).decode())
+        if self._latency_factor:
+            await asyncio.sleep(entry['elapsed'] * self._latency_factor)
+        if self._random.random() < self._error_rate:
+            if self._random.random() < 0.5:
+                raise httpx.ReadTimeout('Injected error')
+            return 503, [], httpx.ByteStream(b''), {}
+        response_headers = [(name.encode('latin-1'), value.encode('latin-1'))
+                            for name, value in entry['headers']]
+        content = base64.b64decode(entry['content'])
+        return entry['status_code'], response_headers, httpx.ByteStream(content), {}
+
+
+def configure_transport(record_path: Optional[str] = None, replay_path: Optional[str] = None,
+                        latency_factor: float = 0, error_rate: float = 0):
+    """Make shared sessions record responses to archive or replay them from archive.
+    Call it before the first request. Without paths real transport is used.
+    """
+    transport_factory: Optional[Callable[[], httpx.AsyncBaseTransport]] = None
+    if replay_path:
+        archive = ResponseArchive(replay_path)
+        transport_factory = lambda: ReplayTransport(archive, latency_factor, error_rate)  # noqa: E731
+    elif record_path:
+        archive = ResponseArchive(record_path)
+        transport_factory = lambda: RecordingTransport(archive)  # noqa: E731
+    session_manager.set_transport_factory(transport_factory)
@@ -1,2 +1,10 @@
 class UnsuccessfulRequestError(Exception):
     pass
+
+
+class CircuitBreakerOpenError(UnsuccessfulRequestError):
+    pass
+
+
+class ReplayMissError(Exception):
+    pass
@@ -1,4 +1,4 @@
-from typing import Optional, Any
+from typing import Optional, Any, Union
 
 import pendulum
 from pydantic.error_wrappers import ValidationError
@@ -15,7 +15,10 @@ __all__ = (
 )
 
 
-def time_to_duration(time_: pendulum.Time) -> pendulum.Duration:
+def time_to_duration(time_: Union[pendulum.Time, float]) -> pendulum.Duration:
+    if isinstance(time_, (int, float)):
+        # Duration serialized as seconds, e.g. by cache.
+        return pendulum.Duration(seconds=time_)
     return pendulum.Duration(hours=time_.hour, minutes=time_.minute, seconds=time_.second)
 
 
@@ -33,7 +36,10 @@ def get_or_none(value: Any) -> Optional[Any]:
     return value or None
 
 
-def minutes_and_seconds_to_duration(minutes_and_seconds: str) -> pendulum.Duration:
+def minutes_and_seconds_to_duration(minutes_and_seconds: Union[str, float]) -> pendulum.Duration:
+    if isinstance(minutes_and_seconds, (int, float)):
+        # Duration serialized as seconds, e.g. by cache.
+        return pendulum.Duration(seconds=minutes_and_seconds)
     minutes, seconds = [int(i) for i in minutes_and_seconds.split(':')]
     return pendulum.Duration(minutes=minutes, seconds=seconds)
 
@@ -0,0 +1,43 @@
+import asyncio
+import concurrent.futures
+import functools
+from typing import Any, Callable, Optional
+
+__all__ = (
+    'run_parsing',
+    'get_parse_executor',
+    'set_parse_executor',
+    'shutdown_parse_executor',
+)
+
+# Threads keep event loop responsive while page is parsed.
+# Process pool lets parsing use more than one core, but then parsing
+# function, its arguments and result must be picklable.
+_parse_executor: Optional[concurrent.futures.Executor] = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix='dodo-api-parser',
+)
+
+
+def get_parse_executor() -> Optional[concurrent.futures.Executor]:
+    return _parse_executor
+
+
+def set_parse_executor(executor: Optional[concurrent.futures.Executor]):
+    """Replace pool of parsing. Pass None to parse inside event loop.
+    Previous pool isn't shut down.
+    """
+    global _parse_executor
+    _parse_executor = executor
+
+
+def shutdown_parse_executor():
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=False)
+
+
+async def run_parsing(function: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run parsing function in pool of parsing, so it doesn't block event loop."""
+    if _parse_executor is None:
+        return function(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_parse_executor, functools.partial(function, *args, **kwargs))
@@ -1,4 +1,3 @@
-import config
 from db import redis_db
 from dodo_api import serializers
 from dodo_api.services import CanceledOrders, CanceledOrderByUUID
@@ -37,24 +36,26 @@ accounts = [
 ]
 
 
-async def get_canceled_orders_list(cookies: dict) -> list[dict]:
-    today = time_utils.get_now_datetime().to_date_string()
-    return await CanceledOrders(cookies, today).get_data()
+async def get_canceled_orders_list(cookies: dict, date: str, account_name: str) -> list[dict]:
+    return await CanceledOrders(cookies, date, account_name=account_name).get_data()
 
 
 async def update_canceled_orders():
+    today = time_utils.get_now_datetime().to_date_string()
     for account_name, department_name in accounts:
-        cookies = redis_db.get_cookies(account_name)
-        canceled_orders = await get_canceled_orders_list(cookies)
+        cookies = await redis_db.get_cookies(account_name)
+        canceled_orders = await get_canceled_orders_list(cookies, today, account_name)
+        new_uuids = set(await redis_db.get_new_canceled_order_uuids(
+            today, (canceled_order['order_uuid'] for canceled_order in canceled_orders)))
         for canceled_order in canceled_orders:
-            if redis_db.is_canceled_order_uuid_in_db(canceled_order['order_uuid']):
+            if canceled_order['order_uuid'] not in new_uuids:
                 continue
             canceled_order_by_uuid = await CanceledOrderByUUID(
                 cookies, canceled_order['order_uuid'], canceled_order['order_price'],
-                canceled_order['order_type']).get_data()
+                canceled_order['order_type'], account_name=account_name).get_data()
             if canceled_order_by_uuid.receipt_printed_at is None:
                 continue
             logger.debug(f'new canceled order with uuid: {canceled_order_by_uuid.order_uuid}')
             serializer = serializers.CanceledOrderReportSerializer(canceled_order_by_uuid)
-            redis_db.add_report_notification_to_queue(serializer.as_json())
-            redis_db.add_canceled_order_uuid(canceled_order_by_uuid.order_uuid)
+            await redis_db.add_report_notification_to_queue(serializer.as_json())
+            await redis_db.add_canceled_order_uuid(today, canceled_order_by_uuid.order_uuid)
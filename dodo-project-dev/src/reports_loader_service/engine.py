@@ -1,17 +1,39 @@
 import asyncio
+import concurrent.futures
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
+import config
+from db import redis_db
+from dodo_api import cache, executor, instrumentation, limits, transports, workers
+from dodo_api.utils import time_utils
 from reports_loader_service import statistics_service, canceled_orders_service, stop_sales_service
+from utils import logger
 
 __all__ = (
     'run_statistics_service',
 )
 
 
+def log_metrics():
+    logger.info(f'dodo api metrics:\n{instrumentation.metrics.get_snapshot()}')
+
+
 def run_statistics_service():
+    cache.set_result_cache(cache.RedisResultCache(redis_db.get_raw_client()))
+    limits.set_interactive_activity(limits.RedisInteractiveActivity(redis_db.get_raw_client()))
+    transports.configure_transport(config.DODO_API_RECORD_PATH, config.DODO_API_REPLAY_PATH,
+                                   config.DODO_API_REPLAY_LATENCY_FACTOR,
+                                   config.DODO_API_REPLAY_ERROR_RATE)
+    loop = asyncio.get_event_loop()
+    today = time_utils.get_now_datetime().to_date_string()
+    if loop.run_until_complete(redis_db.migrate_legacy_canceled_orders_uuids(today)):
+        logger.info(f'legacy canceled orders uuids are moved to {today}')
+    if config.PARSING_PROCESSES > 0:
+        workers.shutdown_parse_executor()
+        workers.set_parse_executor(concurrent.futures.ProcessPoolExecutor(config.PARSING_PROCESSES))
     scheduler = AsyncIOScheduler()
     scheduler.add_job(statistics_service.update_kitchen_statistics, IntervalTrigger(minutes=1))
     scheduler.add_job(statistics_service.update_delivery_statistics, IntervalTrigger(minutes=1))
@@ -22,5 +44,14 @@ def run_statistics_service():
     scheduler.add_job(stop_sales_service.run_sector_stop_sales, CronTrigger(minute='*/10'))
     scheduler.add_job(stop_sales_service.run_ingredient_stop_sales, CronTrigger(minute='*/30'))
     scheduler.add_job(statistics_service.update_orders_statistics, IntervalTrigger(minutes=5))
+    scheduler.add_job(log_metrics, IntervalTrigger(minutes=15))
     scheduler.start()
-    asyncio.get_event_loop().run_forever()
+    try:
+        loop.run_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        scheduler.shutdown(wait=False)
+        loop.run_until_complete(executor.close_sessions())
+        loop.run_until_complete(redis_db.close())
+        workers.shutdown_parse_executor()
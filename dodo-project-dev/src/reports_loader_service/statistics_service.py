@@ -1,6 +1,5 @@
 import asyncio
-from datetime import datetime, timedelta
-from typing import Iterable
+from datetime import datetime
 
 import db
 from db import redis_db
@@ -9,30 +8,39 @@ from dodo_api import (
     KitchenStatistics,
     DetailedDeliveryStatistics,
 )
-from dodo_api.services import get_restaurant_orders
+from dodo_api.services import RestaurantOrders, get_batch_data
 from dodo_api.utils import time_utils
 from utils import logger
 
 
-async def get_detailed_delivery_statistics(cookies: dict, department_ids: Iterable[int]):
-    today_date = time_utils.get_now_datetime().format('DD.MM.YYYY')
-    return await DetailedDeliveryStatistics(cookies, department_ids, today_date, today_date).get_data()
-
-
-async def get_delivery_statistics(cookies: dict, department_id: int):
-    return await DeliveryStatistics(cookies, department_id).get_data()
-
-
-async def get_kitchen_statistics(cookies: dict, department_id: int):
-    return await KitchenStatistics(cookies, department_id).get_data()
+async def get_accounts_cookies(departments) -> dict[str, dict]:
+    """Get cookies of all accounts of departments concurrently, by account name."""
+    account_names = list({department.account_name for department in departments})
+    all_cookies = await asyncio.gather(*(redis_db.get_cookies(account_name)
+                                         for account_name in account_names))
+    return dict(zip(account_names, all_cookies))
 
 
 async def update_kitchen_statistics():
     logger.debug('kitchen statistics updating')
     departments = db.Department.select()
-    for department in departments:
-        cookies = redis_db.get_cookies(department.account_name)
-        new_statistics = await get_kitchen_statistics(cookies, department.id)
+    accounts_cookies = await get_accounts_cookies(departments)
+    services = {
+        KitchenStatistics(accounts_cookies[department.account_name], department.id,
+                          account_name=department.account_name): department
+        for department in departments
+    }
+    async for result in get_batch_data(services, skip_unchanged=True):
+        department = services[result.service]
+        if result.error is not None:
+            logger.warning(f'kitchen statistics of {department.name} not updated: {result.error!r}')
+            continue
+        if result.unchanged:
+            # Statistics are the same, but they are up to date as of now.
+            (db.KitchenStatistics.update(updated_at=datetime.now(time_utils.MOSCOW_UTC))
+             .where(db.KitchenStatistics.department == department).execute())
+            continue
+        new_statistics = result.data
         kitchen_statistics: db.KitchenStatistics = db.KitchenStatistics.get(department=department)
         kitchen_statistics.average_cooking_time = new_statistics.average_cooking_time.in_seconds()
         kitchen_statistics.revenue_per_hour = new_statistics.revenue_per_hour
@@ -49,9 +57,23 @@ async def update_kitchen_statistics():
 async def update_delivery_statistics():
     logger.debug('delivery statistics updating')
     departments = db.Department.select()
-    for department in departments:
-        cookies = redis_db.get_cookies(department.account_name)
-        new_statistics = await get_delivery_statistics(cookies, department.id)
+    accounts_cookies = await get_accounts_cookies(departments)
+    services = {
+        DeliveryStatistics(accounts_cookies[department.account_name], department.id,
+                           account_name=department.account_name): department
+        for department in departments
+    }
+    async for result in get_batch_data(services, skip_unchanged=True):
+        department = services[result.service]
+        if result.error is not None:
+            logger.warning(f'delivery statistics of {department.name} not updated: {result.error!r}')
+            continue
+        if result.unchanged:
+            # Statistics are the same, but they are up to date as of now.
+            (db.DeliveryStatistics.update(updated_at=datetime.now(time_utils.MOSCOW_UTC))
+             .where(db.DeliveryStatistics.department == department).execute())
+            continue
+        new_statistics = result.data
         delivery_statistics: db.DeliveryStatistics = db.DeliveryStatistics.get(department=department)
         delivery_statistics.increase_over_week_ago = new_statistics.increase_over_week_ago
         delivery_statistics.deliveries_amount_per_hour = new_statistics.deliveries_amount_per_hour
@@ -70,8 +92,8 @@ async def update_orders_statistics():
     for account_name in account_names:
         department_ids = {department.id for department in departments if department.account_name == account_name}
         department_ids = list(department_ids)
-        cookies = redis_db.get_cookies(account_name)
-        orders = await get_restaurant_orders(cookies, department_ids, date)
+        cookies = await redis_db.get_cookies(account_name)
+        orders = await RestaurantOrders(cookies, department_ids, date, account_name=account_name).get_data()
         for department in departments:
             orders_by_department = [order for order in orders if order.department.lower().strip() == department.name.lower()]
             if not orders_by_department:
@@ -86,11 +108,27 @@ async def update_detailed_delivery_statistics():
     logger.debug('detailed delivery statistics updating')
     departments = db.Department.select()
     account_names = {department.account_name for department in departments}
-    for account_name in account_names:
-        department_ids = {department.id for department in departments if department.account_name == account_name}
-        cookies = redis_db.get_cookies(account_name)
-        new_statistics = await get_detailed_delivery_statistics(cookies, department_ids)
-        for statistics in new_statistics:
+    today_date = time_utils.get_now_datetime().format('DD.MM.YYYY')
+    accounts_cookies = await get_accounts_cookies(departments)
+    services = {
+        DetailedDeliveryStatistics(
+            accounts_cookies[account_name],
+            {department.id for department in departments if department.account_name == account_name},
+            today_date, today_date, account_name=account_name,
+        ): [department for department in departments if department.account_name == account_name]
+        for account_name in account_names
+    }
+    async for result in get_batch_data(services, skip_unchanged=True):
+        if result.error is not None:
+            logger.warning(f'detailed delivery statistics not updated: {result.error!r}')
+            continue
+        if result.unchanged:
+            # Statistics of account's departments are the same, but they are up to date as of now.
+            (db.DetailedDeliveryStatistics.update(updated_at=datetime.now(time_utils.MOSCOW_UTC))
+             .where(db.DetailedDeliveryStatistics.department.in_(services[result.service]))
+             .execute())
+            continue
+        for statistics in result.data:
             department = [department for department in departments if department.name == statistics.department][0]
             (db.DetailedDeliveryStatistics.update(
                 total_average_time=statistics.total_average_time.in_seconds(),
@@ -0,0 +1,70 @@
+from typing import Callable, Iterable, TypeVar, Union
+
+import config
+from db import redis_db
+from dodo_api.models import (
+    IngredientStopSaleReport,
+    PizzeriaStopSaleReport,
+    SectorStopSaleReport,
+    StopSaleEventType,
+    StopSaleReportType,
+    StreetStopSaleReport,
+)
+from dodo_api.utils import time_utils
+
+__all__ = (
+    'get_stop_sale_key',
+    'track_stop_sales',
+)
+
+StopSale = TypeVar('StopSale', PizzeriaStopSaleReport, SectorStopSaleReport,
+                   StreetStopSaleReport, IngredientStopSaleReport)
+
+
+def get_stop_sale_key(stop_sale: Union[PizzeriaStopSaleReport, SectorStopSaleReport,
+                                       StreetStopSaleReport, IngredientStopSaleReport],
+                      target: str) -> str:
+    return '|'.join((stop_sale.department, target, stop_sale.stopped_at.isoformat()))
+
+
+async def track_stop_sales(
+        stop_sale_type: StopSaleReportType,
+        stop_sales: Iterable[StopSale],
+        get_target: Callable[[StopSale], str],
+) -> list[StopSale]:
+    """Compare stop sales with the previous poll and get events of their changes.
+
+    Stop sale is identified by department, type, target (e.g. sector) and
+    stop time. Event is emitted when stop sale is seen open for the first time
+    (stopped), when open one lasts ALLOWED_STOP_SALES_THRESHOLD minutes
+    (still stopped, once) and when notified one is renewed (resumed).
+    Stop sales that were closed before the first poll produce no events.
+
+    Args:
+        stop_sale_type: Type of stop sales.
+        stop_sales: All stop sales of type in the current poll.
+        get_target: Function that gets stopped target of stop sale.
+
+    Returns:
+        Stop sales with events to notify about.
+    """
+    previous_state = await redis_db.get_stop_sales_state(stop_sale_type.value)
+    state = {}
+    events = []
+    now = time_utils.get_now_datetime()
+    for stop_sale in stop_sales:
+        key = get_stop_sale_key(stop_sale, get_target(stop_sale))
+        last_event = previous_state.get(key)
+        if stop_sale.renewer_name is not None:
+            if last_event is not None:
+                events.append(stop_sale.copy(update={'event': StopSaleEventType.RESUMED}))
+            continue
+        is_past_threshold = (now - stop_sale.stopped_at).in_minutes() >= config.ALLOWED_STOP_SALES_THRESHOLD
+        if last_event is None:
+            events.append(stop_sale.copy(update={'event': StopSaleEventType.STOPPED}))
+        elif last_event == StopSaleEventType.STOPPED and is_past_threshold:
+            events.append(stop_sale.copy(update={'event': StopSaleEventType.STILL_STOPPED}))
+        state[key] = (StopSaleEventType.STILL_STOPPED if is_past_threshold
+                      else StopSaleEventType.STOPPED).value
+    await redis_db.set_stop_sales_state(stop_sale_type.value, state)
+    return events
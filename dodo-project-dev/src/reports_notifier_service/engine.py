@@ -1,5 +1,10 @@
+import asyncio
+import os
+import socket
 import time
+from typing import Iterable, Union
 
+import config
 import db
 from db import redis_db
 from dodo_api import serializers
@@ -9,13 +14,49 @@ from dodo_api.models import (
     PizzeriaStopSaleReport,
     IngredientStopSaleReport,
     SectorStopSaleReport,
+    StopSaleEventType,
     StreetStopSaleReport,
 )
 from dodo_api.utils import time_utils
 from reports_notifier_service import telegram
+from utils import logger
 
+# Milliseconds after which notification pending at crashed or stuck notifier is taken over.
+STALE_NOTIFICATION_IDLE_TIME = 60 * 1000
+# Seconds between resets of idle time of notifications in progress, which can take longer
+# than STALE_NOTIFICATION_IDLE_TIME because of digest window and flood control.
+PENDING_NOTIFICATIONS_REFRESH_INTERVAL = STALE_NOTIFICATION_IDLE_TIME / 1000 / 3
+# Milliseconds to wait for new notifications before checking stale ones again.
+QUEUE_BLOCK_TIME = 5 * 1000
+# Max amount of notifications read from queue at once.
+QUEUE_BATCH_SIZE = 100
+# Max amount of notifications that are being sent at once.
+MAX_NOTIFICATIONS_IN_PROGRESS = 1000
 
-def send_canceled_order_notification(report_notification: CanceledOrderReport):
+
+async def send_message(entry_id: str, chat_id: int, text: str, urgent: bool) -> bool:
+    send = telegram.send_message if urgent else telegram.digest_sender.send
+    if not await send(chat_id, text):
+        return False
+    await redis_db.add_report_notification_chat_id(entry_id, chat_id)
+    return True
+
+
+async def send_messages(entry_id: str, chat_ids: Iterable[int], text: str,
+                        urgent: bool = False) -> bool:
+    """Send text of notification to all chats concurrently, except ones that got it
+    on previous deliveries of notification. Chats that get it are recorded.
+    Urgent text is sent at once, others are sent in digests.
+
+    Returns:
+        Whether all chats got text or it doesn't need to be sent again to them.
+    """
+    sent_chat_ids = await redis_db.get_report_notification_chat_ids(entry_id)
+    return all(await asyncio.gather(*(send_message(entry_id, chat_id, text, urgent)
+                                      for chat_id in set(chat_ids) - sent_chat_ids)))
+
+
+async def send_canceled_order_notification(entry_id: str, report_notification: CanceledOrderReport) -> bool:
     telegram_chats = db.get_telegram_chats_for_canceled_orders_reports(report_notification.department)
     chat_ids = {chat.chat_id for chat in telegram_chats}
     order_lifetime = (
@@ -28,11 +69,11 @@ def send_canceled_order_notification(report_notification: CanceledOrderReport):
             f'Заказ сделан в {report_notification.order_created_at.format("HH:mm")},'
             f' отменён в {report_notification.receipt_printed_at.format("HH:mm")}\n'
             f'Между заказом и отменой прошло {order_lifetime} минут')
-    for chat_id in chat_ids:
-        telegram.send_message(chat_id, text)
+    return await send_messages(entry_id, chat_ids, text)
 
 
-def send_ingredient_stop_sale_report_notification(report_notification: IngredientStopSale):
+async def send_ingredient_stop_sale_report_notification(entry_id: str,
+                                                        report_notification: IngredientStopSale) -> bool:
     telegram_chats = db.get_telegram_chats_for_ingredient_stop_sales(report_notification.sale_point_name)
     chat_ids = {chat.chat_id for chat in telegram_chats}
     lines = [
@@ -45,70 +86,59 @@ def send_ingredient_stop_sale_report_notification(report_notification: Ingredien
     if report_notification.date:
         lines.append(f'Дата {"остановки" if report_notification.action == "stop" else "возобновления"}:'
                      f' {report_notification.date}')
-    for chat_id in chat_ids:
-        telegram.send_message(chat_id, '\n'.join(lines))
+    return await send_messages(entry_id, chat_ids, '\n'.join(lines))
+
 
+def get_stop_sale_title(department: str, report_notification: Union[
+        PizzeriaStopSaleReport, IngredientStopSaleReport, SectorStopSaleReport, StreetStopSaleReport,
+]) -> tuple[str, bool]:
+    """Get the first line of stop sale notification and whether notification is urgent."""
+    stopped_at = report_notification.stopped_at.format("HH:mm")
+    if report_notification.event == StopSaleEventType.RESUMED:
+        return (f'✅ {department} возобновлено после стопа с ({stopped_at}),'
+                f' возобновил {report_notification.renewer_name}\n'), False
+    stop_duration = (time_utils.get_now_datetime() - report_notification.stopped_at).in_minutes()
+    is_urgent = stop_duration >= config.STOP_SALE_URGENCY_THRESHOLD
+    state = 'всё ещё в стопе' if report_notification.event == StopSaleEventType.STILL_STOPPED else 'в стопе'
+    title = f'{department} {state} {stop_duration} минут с ({stopped_at})'
+    if is_urgent:
+        title = f'❗️ {title} ❗️'
+    return f'{title}\n', is_urgent
 
-def send_pizzeria_stop_sale_report_notification(report_notification: PizzeriaStopSaleReport):
+
+async def send_pizzeria_stop_sale_report_notification(entry_id: str,
+                                                      report_notification: PizzeriaStopSaleReport) -> bool:
     telegram_chats = db.get_telegram_chats_for_pizzeria_stop_sales(report_notification.department)
     chat_ids = {chat.chat_id for chat in telegram_chats}
-    stop_duration = (time_utils.get_now_datetime() - report_notification.stopped_at).in_minutes()
-    if stop_duration >= 30:
-        text = [f'❗️ {report_notification.department} в стопе {stop_duration} минут'
-                f' с ({report_notification.stopped_at.format("HH:mm")}) ❗️\n']
-    else:
-        text = [f'{report_notification.department} в стопе {stop_duration} минут'
-                f' с ({report_notification.stopped_at.format("HH:mm")})\n']
-    text.append(f'Причина остановки: {report_notification.stop_reason}\n'
-                f'{report_notification.stop_type}\n'
-                f'Тип продажи: {report_notification.sale_type}')
-    for chat_id in chat_ids:
-        telegram.send_message(chat_id, ''.join(text))
-
-
-def send_ingredients_stop_sale_report_notification(report_notification: IngredientStopSaleReport):
+    title, is_urgent = get_stop_sale_title(report_notification.department, report_notification)
+    text = (f'{title}Причина остановки: {report_notification.stop_reason}\n'
+            f'{report_notification.stop_type}\n'
+            f'Тип продажи: {report_notification.sale_type}')
+    return await send_messages(entry_id, chat_ids, text, urgent=is_urgent)
+
+
+async def send_ingredients_stop_sale_report_notification(entry_id: str,
+                                                         report_notification: IngredientStopSaleReport) -> bool:
     telegram_chats = db.get_telegram_chats_for_ingredients_stop_sales(report_notification.department)
     chat_ids = {chat.chat_id for chat in telegram_chats}
-    stop_duration = (time_utils.get_now_datetime() - report_notification.stopped_at).in_minutes()
-    if stop_duration >= 30:
-        text = [f'❗️ {report_notification.department.capitalize()} в стопе {stop_duration} минут'
-                f' с ({report_notification.stopped_at.format("HH:mm")}) ❗️\n']
-    else:
-        text = [f'{report_notification.department} в стопе {stop_duration} минут'
-                f' с ({report_notification.stopped_at.format("HH:mm")})\n']
-    text.append(f'Ингредиент: {report_notification.ingredient}')
-    for chat_id in chat_ids:
-        telegram.send_message(chat_id, ''.join(text))
-
-
-def send_sector_stop_sale_report_notification(report_notification: SectorStopSaleReport):
+    title, is_urgent = get_stop_sale_title(report_notification.department.capitalize(), report_notification)
+    return await send_messages(entry_id, chat_ids, f'{title}Ингредиент: {report_notification.ingredient}', urgent=is_urgent)
+
+
+async def send_sector_stop_sale_report_notification(entry_id: str,
+                                                    report_notification: SectorStopSaleReport) -> bool:
     telegram_chats = db.get_telegram_chats_for_sector_stop_sales(report_notification.department)
     chat_ids = {chat.chat_id for chat in telegram_chats}
-    stop_duration = (time_utils.get_now_datetime() - report_notification.stopped_at).in_minutes()
-    if stop_duration >= 30:
-        text = [f'❗️ {report_notification.department.capitalize()} в стопе {stop_duration} минут'
-                f' с ({report_notification.stopped_at.format("HH:mm")}) ❗️\n']
-    else:
-        text = [f'{report_notification.department} в стопе {stop_duration} минут'
-                f' с ({report_notification.stopped_at.format("HH:mm")})\n']
-    text.append(f'Сектор: {report_notification.sector}')
-    for chat_id in chat_ids:
-        telegram.send_message(chat_id, ''.join(text))
-
-
-def send_street_stop_sale_report_notification(report_notification: StreetStopSaleReport):
+    title, is_urgent = get_stop_sale_title(report_notification.department.capitalize(), report_notification)
+    return await send_messages(entry_id, chat_ids, f'{title}Сектор: {report_notification.sector}', urgent=is_urgent)
+
+
+async def send_street_stop_sale_report_notification(entry_id: str,
+                                                    report_notification: StreetStopSaleReport) -> bool:
     telegram_chats = db.get_telegram_chats_for_street_stop_sales(report_notification.department)
     chat_ids = {chat.chat_id for chat in telegram_chats}
-    stop_duration = (time_utils.get_now_datetime() - report_notification.stopped_at).in_minutes()
-    if stop_duration >= 30:
-        text = [f'❗️ {report_notification.department.capitalize()} в стопе {stop_duration} минут'
-                f' с ({report_notification.stopped_at.format("HH:mm")}) ❗️\n']
-    else:
-        text = [f'{report_notification.department} в стопе {stop_duration} минут'
-                f' с ({report_notification.stopped_at.format("HH:mm")})\n']
-    text.append(f'Улица: {report_notification.street}')
-    for chat_id in chat_ids:
-        telegram.send_message(chat_id, ''.join(text))
+    title, is_urgent = get_stop_sale_title(report_notification.department.capitalize(), report_notification)
+    return await send_messages(entry_id, chat_ids, f'{title}Улица: {report_notification.street}', urgent=is_urgent)
 
 
 notification_types_map = {
@@ -143,16 +173,105 @@ serializers_map = [
 ]
 
 
-def run_notifier_service():
+def get_consumer_name() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+async def send_report_notification(entry_id: str, report_notification: str) -> bool:
+    """Send notification to its chats.
+
+    Returns:
+        Whether notification doesn't need to be sent again.
+    """
+    for serializer_tools in serializers_map:
+        serializer = serializer_tools['serializer']
+        callback = serializer_tools['send_report_callback']
+        if serializer.is_correct_serializer(report_notification):
+            return await callback(entry_id, serializer(report_notification).as_python())
+    logger.warning(f'unknown report notification: {report_notification}')
+    return True
+
+
+async def handle_unsent_report_notification(entry_id: str, report_notification: str, error: str):
+    """Leave notification pending, so it's taken over again after idle time,
+    or move it to dead letters if it's delivered NOTIFICATION_MAX_DELIVERIES times already.
+    """
+    deliveries = await redis_db.get_report_notification_deliveries(entry_id)
+    if deliveries < config.NOTIFICATION_MAX_DELIVERIES:
+        return
+    logger.error(f'report notification {entry_id} moved to dead letters'
+                 f' after {deliveries} deliveries: {error}')
+    await redis_db.move_report_notification_to_dead_letters(entry_id, report_notification, error)
+
+
+async def handle_report_notification(entry_id: str, report_notification: str):
+    try:
+        is_sent = await send_report_notification(entry_id, report_notification)
+    except Exception as error:
+        logger.exception(f'report notification {entry_id} not sent')
+        await handle_unsent_report_notification(entry_id, report_notification, repr(error))
+        return
+    if not is_sent:
+        logger.warning(f'report notification {entry_id} not sent to all chats')
+        await handle_unsent_report_notification(entry_id, report_notification,
+                                                'not sent to all chats')
+        return
+    await redis_db.acknowledge_report_notifications(entry_id)
+
+
+async def keep_report_notifications_pending(consumer_name: str, tasks: dict[str, asyncio.Task]):
+    """Keep notifications in progress from being taken over by other notifiers."""
     while True:
-        report_notification = redis_db.get_report_notification_from_queue()
-        if report_notification is None:
-            time.sleep(1)
+        await asyncio.sleep(PENDING_NOTIFICATIONS_REFRESH_INTERVAL)
+        try:
+            await redis_db.refresh_report_notifications(consumer_name, *tasks)
+        except Exception:
+            logger.exception('idle time of report notifications in progress not reset')
+
+
+async def consume_report_notifications():
+    """Send notifications from queue. Every notification is handled in its own task,
+    because notifications that go into digests wait for the end of digest window.
+    """
+    consumer_name = get_consumer_name()
+    await redis_db.create_report_notifications_group()
+    tasks: dict[str, asyncio.Task] = {}
+    refresh_task = asyncio.ensure_future(keep_report_notifications_pending(consumer_name, tasks))
+    try:
+        await _consume_report_notifications(consumer_name, tasks)
+    finally:
+        refresh_task.cancel()
+
+
+async def _consume_report_notifications(consumer_name: str, tasks: dict[str, asyncio.Task]):
+    claimed_at = 0.0
+    while True:
+        if len(tasks) >= MAX_NOTIFICATIONS_IN_PROGRESS:
+            await asyncio.wait(list(tasks.values()), return_when=asyncio.FIRST_COMPLETED)
             continue
-        for serializer_tools in serializers_map:
-            serializer = serializer_tools['serializer']
-            callback = serializer_tools['send_report_callback']
-            if serializer.is_correct_serializer(report_notification):
-                callback(serializer(report_notification).as_python())
-                break
-        time.sleep(1)
+        report_notifications = []
+        if time.monotonic() - claimed_at >= STALE_NOTIFICATION_IDLE_TIME / 1000:
+            report_notifications = await redis_db.claim_stale_report_notifications(
+                consumer_name, STALE_NOTIFICATION_IDLE_TIME, QUEUE_BATCH_SIZE)
+            claimed_at = time.monotonic()
+        if not report_notifications:
+            # Waits in Redis until notification is added, so it's sent without delay.
+            report_notifications = await redis_db.get_report_notifications_from_queue(
+                consumer_name, QUEUE_BATCH_SIZE, block=QUEUE_BLOCK_TIME)
+        for entry_id, report_notification in report_notifications:
+            if entry_id in tasks:
+                continue
+            tasks[entry_id] = asyncio.ensure_future(
+                handle_report_notification(entry_id, report_notification))
+            tasks[entry_id].add_done_callback(lambda _, entry_id=entry_id: tasks.pop(entry_id))
+
+
+def run_notifier_service():
+    loop = asyncio.get_event_loop()
+    try:
+        loop.run_until_complete(consume_report_notifications())
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        loop.run_until_complete(telegram.close())
+        loop.run_until_complete(redis_db.close())
@@ -1,19 +1,164 @@
-import contextlib
-import time
+import asyncio
+import re
+from typing import Iterable, NamedTuple
 
-from aiogram import executor, Bot, Dispatcher
+from aiogram import Bot
 from aiogram.types import ParseMode
-from aiogram.utils.exceptions import TelegramAPIError
+from aiogram.utils.exceptions import BadRequest, RetryAfter, TelegramAPIError, Unauthorized
 
 import config
+from utils import logger
+from utils.telegram_limits import telegram_rate_limiter
 
 bot = Bot(config.TELEGRAM_BOT_TOKEN, parse_mode=ParseMode.HTML)
-dp = Dispatcher(bot)
 
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_SEPARATOR = '\n\n'
+# Length of the longest HTML entity, e.g. "&#1114111;".
+MAX_ENTITY_LENGTH = 10
 
-def send_message(chat_id: int, text: str):
-    for _ in range(3):
-        with contextlib.suppress(TelegramAPIError):
-            executor.start(dp, bot.send_message(chat_id, text))
-            time.sleep(0.1)
-            break
+
+async def send_message(chat_id: int, text: str) -> bool:
+    """Send message, trying TELEGRAM_NOTIFICATION_ATTEMPTS times.
+    Flood control isn't retried here, since rate limiter has retried it already.
+    Message rejected for good, e.g. because bot is kicked from chat
+    or markup is invalid, isn't retried at all.
+
+    Returns:
+        Whether message doesn't need to be sent again.
+    """
+    for _ in range(config.TELEGRAM_NOTIFICATION_ATTEMPTS):
+        try:
+            await telegram_rate_limiter.send(chat_id, lambda: bot.send_message(chat_id, text))
+        except RetryAfter as error:
+            logger.warning(f'message to chat {chat_id} not sent: {error!r}')
+            return False
+        except (BadRequest, Unauthorized) as error:
+            logger.error(f'message to chat {chat_id} rejected: {error!r}')
+            return True
+        except TelegramAPIError as error:
+            logger.warning(f'message to chat {chat_id} not sent: {error!r}')
+        else:
+            return True
+    return False
+
+
+def _cut_line(line: str, max_length: int) -> list[str]:
+    """Cut line longer than max_length. Tags are dropped, since they can't be closed
+    in the middle of line, and entities are kept whole.
+    """
+    if len(line) <= max_length:
+        return [line]
+    line = re.sub(r'<[^>]*>', '', line)
+    parts = []
+    while len(line) > max_length:
+        end = max_length
+        entity_start = line.rfind('&', end - MAX_ENTITY_LENGTH, end)
+        if entity_start > 0 and ';' not in line[entity_start:end]:
+            end = entity_start
+        parts.append(line[:end])
+        line = line[end:]
+    parts.append(line)
+    return parts
+
+
+class DigestMessage(NamedTuple):
+    text: str
+    # Indices of texts of digest whose parts are in message.
+    text_indices: frozenset[int]
+
+
+def split_digest(texts: Iterable[str], max_length: int = MAX_MESSAGE_LENGTH) -> list[DigestMessage]:
+    """Join texts into as few messages as possible, each one not longer than max_length.
+
+    Messages are split between texts, and text longer than max_length is split
+    between its lines, so HTML markup of texts stays valid.
+    Tags of text must not span lines.
+    """
+    messages = []
+    current = ''
+    current_indices = set()
+    for index, text in enumerate(texts):
+        parts = [text]
+        if len(text) > max_length:
+            parts = [part for line in text.split('\n') for part in _cut_line(line, max_length)]
+        separator = DIGEST_SEPARATOR
+        for part in parts:
+            if current and len(current) + len(separator) + len(part) <= max_length:
+                current += separator + part
+            else:
+                if current:
+                    messages.append(DigestMessage(current, frozenset(current_indices)))
+                current = part
+                current_indices = set()
+            current_indices.add(index)
+            separator = '\n'
+    if current:
+        messages.append(DigestMessage(current, frozenset(current_indices)))
+    return messages
+
+
+class Digest(NamedTuple):
+    texts: list[str]
+    # Results of sending of every text.
+    sent: list[asyncio.Future]
+
+
+class DigestSender:
+    """Collects texts to chat during window and sends them as few messages.
+
+    Window of chat starts with its first text, so text is delayed by window at most.
+
+    Attributes:
+        window: Seconds while texts to chat are collected.
+    """
+
+    def __init__(self, window: float):
+        self._window = window
+        self._digests: dict[int, Digest] = {}
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    async def send(self, chat_id: int, text: str) -> bool:
+        """Add text to digest of chat and wait until digest is sent.
+
+        Returns:
+            Whether text doesn't need to be sent again, i.e. all messages with its parts.
+        """
+        if self._window <= 0:
+            return await send_message(chat_id, text)
+        loop = asyncio.get_running_loop()
+        if chat_id not in self._digests:
+            self._digests[chat_id] = Digest(texts=[], sent=[])
+            loop.call_later(self._window, self._start_flush, chat_id)
+        digest = self._digests[chat_id]
+        sent = loop.create_future()
+        digest.texts.append(text)
+        digest.sent.append(sent)
+        return await asyncio.shield(sent)
+
+    def _start_flush(self, chat_id: int):
+        task = asyncio.ensure_future(self._flush(chat_id))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self, chat_id: int):
+        digest = self._digests.pop(chat_id)
+        unsent_indices = set()
+        try:
+            for message in split_digest(digest.texts):
+                if not await send_message(chat_id, message.text):
+                    unsent_indices |= message.text_indices
+        except Exception as error:
+            for sent in digest.sent:
+                sent.set_exception(error)
+        else:
+            for index, sent in enumerate(digest.sent):
+                sent.set_result(index not in unsent_indices)
+
+
+digest_sender = DigestSender(config.NOTIFICATION_DIGEST_WINDOW)
+
+
+async def close():
+    session = await bot.get_session()
+    await session.close()
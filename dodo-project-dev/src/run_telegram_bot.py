@@ -1,11 +1,12 @@
 from aiogram import executor
 
 import telegram_bot.handlers
-from telegram_bot.bot import dp, on_startup
+from telegram_bot.bot import dp, on_startup, on_shutdown
 
 if __name__ == '__main__':
     executor.start_polling(
         dispatcher=dp,
         skip_updates=True,
         on_startup=on_startup,
+        on_shutdown=on_shutdown,
     )
@@ -3,12 +3,15 @@ from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.types import BotCommand, ParseMode
 
 import config
+from db import redis_db
+from dodo_api import cache, executor, limits, transports, workers
 from telegram_bot.middlewares import ProcessResponseMiddleware
 
 __all__ = (
     'bot',
     'dp',
     'on_startup',
+    'on_shutdown',
 )
 
 bot = Bot(token=config.TELEGRAM_BOT_TOKEN, parse_mode=ParseMode.HTML)
@@ -35,5 +38,16 @@ async def setup_commands(dispatcher: Dispatcher):
 
 
 async def on_startup(dispatcher: Dispatcher):
+    cache.set_result_cache(cache.RedisResultCache(redis_db.get_raw_client()))
+    limits.set_interactive_activity(limits.RedisInteractiveActivity(redis_db.get_raw_client()))
+    transports.configure_transport(config.DODO_API_RECORD_PATH, config.DODO_API_REPLAY_PATH,
+                                   config.DODO_API_REPLAY_LATENCY_FACTOR,
+                                   config.DODO_API_REPLAY_ERROR_RATE)
     dispatcher.setup_middleware(ProcessResponseMiddleware(dispatcher.bot))
     await setup_commands(dispatcher)
+
+
+async def on_shutdown(dispatcher: Dispatcher):
+    await executor.close_sessions()
+    await redis_db.close()
+    workers.shutdown_parse_executor()
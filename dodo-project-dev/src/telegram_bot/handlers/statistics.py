@@ -1,5 +1,4 @@
 import asyncio
-import itertools
 from typing import Union
 
 from aiogram.dispatcher.filters import Text, Command
@@ -45,8 +44,8 @@ async def on_being_late_certificates_command(query: Union[Message, CallbackQuery
     for account_name in account_names:
         department_ids = [department.id for department in departments
                           if department.account_name == account_name]
-        cookies = redis_db.get_cookies(account_name)
-        tasks.append(get_being_late_certificates(cookies, department_ids))
+        cookies = await redis_db.get_cookies(account_name)
+        tasks.append(get_being_late_certificates(cookies, department_ids, account_name))
     all_certificates = await asyncio.gather(*tasks)
     all_today_certificates = []
     all_week_before_certificates = []
@@ -187,12 +186,13 @@ async def on_kitchen_performance_command(query: Union[Message, CallbackQuery], d
 )
 async def on_daily_revenue_command(query: Union[Message, CallbackQuery], departments):
     department_ids = [department.id for department in departments]
-    cached_revenues_result = cache.get_daily_revenue_from_cache(department_ids)
+    cached_revenues_result = await cache.get_daily_revenue_from_cache(department_ids)
     all_revenues = cached_revenues_result.cached_revenues
     if cached_revenues_result.missing_in_cache_department_ids:
-        all_revenues += await get_revenue_statistics(
+        fetched_revenues = await get_revenue_statistics(
             cached_revenues_result.missing_in_cache_department_ids)
-    cache.cache_daily_revenue_in_redis(all_revenues)
+        await cache.cache_daily_revenue_in_redis(fetched_revenues)
+        all_revenues += fetched_revenues
     return responses.DailyRevenueStatisticsResponse(all_revenues, departments)
 
 
@@ -8,6 +8,7 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.utils.exceptions import TelegramAPIError
 
 from telegram_bot.responses.base import Response
+from utils.telegram_limits import telegram_rate_limiter
 
 
 class ProcessResponseMiddleware(BaseMiddleware):
@@ -29,10 +30,11 @@ class ProcessResponseMiddleware(BaseMiddleware):
             text, reply_markup = response.get_text(), response.get_reply_markup()
             chat_id = response.get_chat_id() or message.chat.id
             if response.edit:
-                await self._bot.edit_message_text(text, chat_id, message.message_id,
-                                                  reply_markup=reply_markup)
+                await telegram_rate_limiter.send(chat_id, lambda: self._bot.edit_message_text(
+                    text, chat_id, message.message_id, reply_markup=reply_markup))
             else:
-                await self._bot.send_message(chat_id, text, reply_markup=reply_markup)
+                await telegram_rate_limiter.send(chat_id, lambda: self._bot.send_message(
+                    chat_id, text, reply_markup=reply_markup))
 
     async def on_post_process_callback_query(self, callback_query: CallbackQuery,
                                              data_from_handler: list, data: dict):
@@ -46,7 +48,9 @@ class ProcessResponseMiddleware(BaseMiddleware):
             chat_id = response.get_chat_id() or callback_query.message.chat.id
             with contextlib.suppress(TelegramAPIError):
                 if response.edit:
-                    await self._bot.edit_message_text(text, chat_id, callback_query.message.message_id, reply_markup=reply_markup)
+                    await telegram_rate_limiter.send(chat_id, lambda: self._bot.edit_message_text(
+                        text, chat_id, callback_query.message.message_id, reply_markup=reply_markup))
                 else:
-                    await self._bot.send_message(chat_id, text, reply_markup=reply_markup)
+                    await telegram_rate_limiter.send(chat_id, lambda: self._bot.send_message(
+                        chat_id, text, reply_markup=reply_markup))
         await callback_query.answer()
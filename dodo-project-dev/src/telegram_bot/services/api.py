@@ -1,11 +1,13 @@
 import asyncio
-from typing import Iterable, Tuple, List
+from typing import Iterable, Optional
 
 import httpx
 
+from dodo_api.limits import INTERACTIVE_PRIORITY
 from dodo_api.services import RevenueStatistics, BeingLateCertificates
 from dodo_api.models import OperationalStatisticsForTodayAndWeekBefore, BeingLateCertificate
 from dodo_api.utils import time_utils
+from dodo_api.utils.exceptions import UnsuccessfulRequestError
 from telegram_bot.utils.exceptions import DodoPublicAPIError
 
 
@@ -24,22 +26,25 @@ async def get_revenue_statistics(
         DodoPublicAPIError: If any http error occurs.
     """
     try:
-        tasks = (RevenueStatistics(department_id).get_data() for department_id in department_ids)
+        tasks = (RevenueStatistics(department_id, priority=INTERACTIVE_PRIORITY).get_data()
+                 for department_id in department_ids)
         return await asyncio.gather(*tasks)
-    except httpx.HTTPError:
+    except (httpx.HTTPError, UnsuccessfulRequestError):
         raise DodoPublicAPIError
 
 
 async def get_being_late_certificates(
-        cookies: dict, department_ids: Iterable[int]
+        cookies: dict, department_ids: Iterable[int], account_name: Optional[str] = None,
 ) -> tuple[list[BeingLateCertificate], list[BeingLateCertificate]]:
     today_date = time_utils.get_now_datetime().format('DD.MM.YYYY')
     week_before_date = time_utils.get_now_datetime().subtract(days=7).format('DD.MM.YYYY')
     try:
         today_certificates = await BeingLateCertificates(
-            cookies, department_ids, today_date, today_date).get_data()
+            cookies, department_ids, today_date, today_date,
+            account_name=account_name, priority=INTERACTIVE_PRIORITY).get_data()
         week_before_certificates = await BeingLateCertificates(
-            cookies, department_ids, week_before_date, week_before_date).get_data()
-    except httpx.HTTPError:
+            cookies, department_ids, week_before_date, week_before_date,
+            account_name=account_name, priority=INTERACTIVE_PRIORITY).get_data()
+    except (httpx.HTTPError, UnsuccessfulRequestError):
         raise DodoPublicAPIError
     return today_certificates, week_before_certificates
@@ -2,7 +2,6 @@ import json
 from typing import Iterable, NamedTuple
 
 from db import redis_db
-from db.exceptions import CachedObjectExpiredOrMissing
 from dodo_api.models import OperationalStatisticsForTodayAndWeekBefore
 
 
@@ -11,19 +10,25 @@ class CachedRevenuesResult(NamedTuple):
     missing_in_cache_department_ids: Iterable[int]
 
 
-def cache_daily_revenue_in_redis(
-        revenue_reports: Iterable[OperationalStatisticsForTodayAndWeekBefore]
-) -> Iterable[int]:
-    cached_department_ids = []
-    for revenue_report in revenue_reports:
-        json_string = json.dumps(revenue_report.dict(by_alias=True), default=str)
-        is_set = redis_db.set_to_cache(f'revenue_report_{revenue_report.unit_id}', json_string)
-        if is_set:
-            cached_department_ids.append(revenue_report.unit_id)
-    return cached_department_ids
+def get_revenue_report_cache_key(department_id: int) -> str:
+    return f'revenue_report_{department_id}'
 
 
-def get_daily_revenue_from_cache(
+async def cache_daily_revenue_in_redis(
+        revenue_reports: Iterable[OperationalStatisticsForTodayAndWeekBefore]
+) -> Iterable[int]:
+    revenue_reports = list(revenue_reports)
+    json_strings = {
+        get_revenue_report_cache_key(revenue_report.unit_id):
+            json.dumps(revenue_report.dict(by_alias=True), default=str)
+        for revenue_report in revenue_reports
+    }
+    results = await redis_db.set_many_to_cache(json_strings)
+    return [revenue_report.unit_id for revenue_report in revenue_reports
+            if results[get_revenue_report_cache_key(revenue_report.unit_id)]]
+
+
+async def get_daily_revenue_from_cache(
         department_ids: Iterable[int]
 ) -> CachedRevenuesResult:
     """Get revenue statistics from cache (redis).
@@ -36,14 +41,16 @@ def get_daily_revenue_from_cache(
         First one contains revenue statistics that were found in redis.
         Second one contains department IDs if revenue statistics that weren't found in redis.
     """
+    department_ids = list(department_ids)
+    cached = await redis_db.get_many_from_cache(
+        get_revenue_report_cache_key(department_id) for department_id in department_ids)
     cached_revenues = []
     missing_in_cache = []
     for department_id in department_ids:
-        try:
-            cached = redis_db.get_from_cache(f'revenue_report_{department_id}')
-        except CachedObjectExpiredOrMissing:
+        json_string = cached[get_revenue_report_cache_key(department_id)]
+        if json_string is None:
             missing_in_cache.append(department_id)
         else:
-            cached_revenues.append(OperationalStatisticsForTodayAndWeekBefore.parse_raw(cached))
+            cached_revenues.append(OperationalStatisticsForTodayAndWeekBefore.parse_raw(json_string))
     return CachedRevenuesResult(cached_revenues=cached_revenues,
                                 missing_in_cache_department_ids=missing_in_cache)
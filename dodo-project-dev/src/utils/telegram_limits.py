@@ -0,0 +1,89 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from aiogram.utils.exceptions import RetryAfter
+
+from dodo_api.limits import TokenBucket
+from utils import logger
+
+__all__ = (
+    'TelegramRateLimiter',
+    'telegram_rate_limiter',
+)
+
+T = TypeVar('T')
+
+
+class TelegramRateLimiter:
+    """Keeps outbound messages of bot within Telegram limits.
+
+    Every message waits for token of its chat, of its group if chat is group
+    (group IDs are negative), and global one. Messages of the same chat are
+    sent in order of calls. Message rejected by Telegram with RetryAfter is
+    sent again after requested time, and the whole chat is paused till then.
+
+    Limiter keeps its tokens in memory of process, and bot and notifier processes
+    send with the same token, so each of them gets half of Telegram's 30 messages
+    per second. Chat and group limits aren't shared either: bot mostly answers
+    in private chats and notifier writes to groups, and rare overlaps are
+    handled by RetryAfter.
+
+    Attributes:
+        global_rate: Messages per second of all chats of process.
+        chat_rate: Messages per second in one chat.
+        chat_burst: Messages that may be sent to one chat at once.
+        group_rate: Messages per minute in one group.
+        max_retries: Max amount of resending of message after RetryAfter.
+    """
+
+    def __init__(self, global_rate: float = 15, chat_rate: float = 1, chat_burst: int = 3,
+                 group_rate: float = 19, max_retries: int = 5):
+        self._global_bucket = TokenBucket(global_rate, 1)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._group_rate = group_rate
+        self._max_retries = max_retries
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._group_buckets: dict[int, TokenBucket] = {}
+        self._paused_until: dict[int, float] = {}
+
+    async def _acquire(self, chat_id: int):
+        delay = self._paused_until.get(chat_id, 0) - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if chat_id not in self._chat_buckets:
+            self._chat_buckets[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        await self._chat_buckets[chat_id].acquire()
+        if chat_id < 0:
+            if chat_id not in self._group_buckets:
+                self._group_buckets[chat_id] = TokenBucket(self._group_rate / 60, 1)
+            await self._group_buckets[chat_id].acquire()
+        await self._global_bucket.acquire()
+
+    async def send(self, chat_id: int, send: Callable[[], Awaitable[T]]) -> T:
+        """Call function that sends or edits message in chat when limits allow it.
+
+        Args:
+            chat_id: ID of chat of message.
+            send: Function that sends message, it's called again after RetryAfter.
+
+        Returns:
+            Result of function.
+
+        Raises:
+            RetryAfter: If message is rejected more than max_retries times.
+        """
+        for attempt in range(self._max_retries + 1):
+            await self._acquire(chat_id)
+            try:
+                return await send()
+            except RetryAfter as error:
+                if attempt == self._max_retries:
+                    raise
+                logger.warning(f'flood control of chat {chat_id}, retry in {error.timeout} seconds')
+                self._paused_until[chat_id] = max(self._paused_until.get(chat_id, 0),
+                                                  time.monotonic() + error.timeout)
+
+
+telegram_rate_limiter = TelegramRateLimiter()
@@ -0,0 +1,50 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / 'src'))
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / 'benchmarks'))
+
+from dodo_api.parsers import html  # noqa: E402
+
+import fixtures  # noqa: E402
+
+PARSERS = {
+    'kitchen_statistics': html.KitchenStatisticsHTMLParser,
+    'delivery_statistics': html.DeliveryStatisticsHTMLParser,
+    'canceled_orders': html.CanceledOrderUUIDsParser,
+    'canceled_order': html.CanceledOrderByUUIDHTMLParser,
+    'departments_list': html.DepartmentsListHTMLParser,
+    'pizzeria_stop_sales': html.PizzeriaStopSalesHTMLParser,
+    'sector_stop_sales': html.SectorStopSalesHTMLParser,
+    'street_stop_sales': html.StreetStopSalesHTMLParser,
+    'ingredient_stop_sales': html.IngredientStopSalesHTMLParser,
+    'restaurant_orders': html.RestaurantOrdersParser,
+}
+
+
+def parse(parser: type[html.HTMLParser], page: bytes, backend: str):
+    if issubclass(parser, html.CanceledOrderByUUIDHTMLParser):
+        return parser(page, 'uuid', '1000', 'Доставка', backend=backend).parse()
+    return parser(page, backend=backend).parse()
+
+
+@pytest.mark.parametrize('backend', (html.SOUP_BACKEND, html.LXML_BACKEND))
+@pytest.mark.parametrize('size', ('small', 'medium'))
+@pytest.mark.parametrize('name', PARSERS)
+def test_targeted_parsing_is_the_same_as_full(name: str, size: str, backend: str):
+    parser = PARSERS[name]
+    full_parser = type(f'Full{parser.__name__}', (parser,), {'targets': ()})
+    page = fixtures.load_fixture(name, size)
+
+    assert parser.targets
+    assert parse(parser, page, backend) == parse(full_parser, page, backend)
+
+
+def test_lxml_backend_keeps_only_targets():
+    page = fixtures.load_fixture('pizzeria_stop_sales', 'small')
+    tree = html.PizzeriaStopSalesHTMLParser(page).get_targets_tree()
+
+    assert [element.get('id') for element in tree] == ['bootgrid-table']
+    assert not tree.xpath('.//script')